@@ -0,0 +1,243 @@
+"""
+Benchmarks data loading and page building on synthetic squads and writes the timings as JSON.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --players 20 200 --matches 10 100 --compare bench.json
+
+With --compare, cases whose median time grew by more than --threshold are reported
+and the exit code is 1, so a run can gate a deploy.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+from charts import comparison_chart, form_chart, goals_assists_chart, top_players_chart
+from comparison import compare_players, form_chart_data
+from dataloader import invalidate_cache, load_sheets
+from datasets import build_datasets
+from dummydata import generate_dummy_passes
+from heatmap import HEATMAP_ENGINES, render_heatmap, render_overlay
+from events import events_from_wide, player_dtype
+from leaderboard import Leaderboard
+from passstore import player_slice
+from ingest import LiveStats
+from stats import player_totals, rank_players
+from synthetic import make_sheets, write_workbook
+
+DEFAULT_PLAYERS = [20, 200, 2000]
+DEFAULT_MATCHES = [10, 100, 1000, 10000]
+
+# Most players put side by side on the comparison page case
+COMPARED_PLAYERS = 25
+
+
+def time_call(fn, repeat, setup=None):
+    """
+    Runs fn repeat times and returns the wall time of each run in seconds.
+    With setup, each run is given a fresh result of setup(), which is not timed.
+    """
+    runs = []
+    for _ in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        start = time.perf_counter()
+        fn(*args)
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def benchmark_squad(n_players, n_matches, repeat, max_workbook_cells):
+    """
+    Times every case for one synthetic squad. Returns a dict of case name to run times,
+    or to a reason string when the case was skipped.
+    """
+    sheets = make_sheets(n_players, n_matches)
+    goals, assists = sheets['goals'], sheets['assists']
+    players = player_dtype(sheets['player_info'], goals, assists)
+    events, match_dates = events_from_wide(goals, assists, players)
+    results = dict()
+
+    # load_data: the workbook round trip is only timed while openpyxl can write it in reasonable time
+    if n_players * n_matches <= max_workbook_cells:
+        with tempfile.TemporaryDirectory() as tmp:
+            excel_file, cache_dir = os.path.join(tmp, 'tmb_fc_data.xlsx'), os.path.join(tmp, 'cache')
+            write_workbook(sheets, excel_file)
+
+            def cold_load():
+                invalidate_cache(cache_dir)
+                build_datasets(load_sheets(excel_file, cache_dir))
+
+            results['load_data (cold cache)'] = time_call(cold_load, repeat)
+            results['load_data (warm cache)'] = time_call(lambda: build_datasets(load_sheets(excel_file, cache_dir)), repeat)
+    else:
+        reason = f'workbook larger than {max_workbook_cells} cells'
+        results['load_data (cold cache)'] = results['load_data (warm cache)'] = reason
+
+    results['build_datasets'] = time_call(lambda: build_datasets(sheets), repeat)
+    results['events_from_wide'] = time_call(lambda: events_from_wide(goals, assists, players), repeat)
+    positions = sheets['player_info'][['player_name', 'primary_position']]
+    results['generate_dummy_passes'] = time_call(lambda: generate_dummy_passes(positions), repeat)
+    # The full sort the leaderboard replaced, kept as the baseline it is compared with
+    results['rank_players (legacy sort, totals + top 5)'] = time_call(
+        lambda: rank_players(player_totals(events), 'Goals'), repeat)
+    results['Leaderboard (build)'] = time_call(lambda: Leaderboard(events, match_dates), repeat)
+    leaderboard = Leaderboard(events, match_dates)
+    # Uncached queries, as after every ingested match: each run gets a leaderboard with nothing cached
+    results['Leaderboard (top 5 + form)'] = time_call(
+        lambda board: (board.top('Goal Contributions'), board.form('Goal Contributions')),
+        repeat, setup=lambda: Leaderboard(events, match_dates))
+    club_info = sheets['club_info']
+    live_stats = LiveStats(events, match_dates, club_info)
+    timeline = live_stats.team_timeline()
+    first, last = match_dates[len(match_dates) // 2], match_dates[-1]
+    results['Timeline (window totals + chart)'] = time_call(
+        lambda: (timeline.totals(first, last), timeline.chart_data(first, last)), repeat)
+
+    # Player Statistics: the data and figures for the first player of the squad
+    player_info, _, _, _, _, passes_data, _, heatmap_grids, pass_offsets = build_datasets(sheets)
+    player = player_info['player_name'].iloc[0]
+
+    # As on the page: the player's timeline is built on first view, then reruns read their period from it
+    results['Timeline (player, build)'] = time_call(
+        lambda stats: stats.player_timeline(player), repeat, setup=lambda: LiveStats(events, match_dates, club_info))
+
+    def player_stats_data():
+        player_timeline = live_stats.player_timeline(player)
+        player_timeline.totals()
+        player_data, _ = player_timeline.chart_data()
+        goals_assists_chart(player_data, ['Goals', 'Assists'], f"Goals and Assists Over Time for {player}")
+        return player_slice(passes_data, pass_offsets, player)
+
+    results['generate_player_stats (data + chart)'] = time_call(player_stats_data, repeat)
+    player_passes = player_stats_data()
+    for engine in HEATMAP_ENGINES:
+        results[f'generate_player_stats (heatmap, {engine})'] = time_call(
+            lambda: render_heatmap(player_passes, True, engine, heatmap_grids.get(player)), repeat)
+
+    # Club Overview: the snapshot, built once per data version, and the page reading it
+    results['club_snapshot (build)'] = time_call(
+        lambda: LiveStats(events, match_dates, club_info).club_snapshot(), repeat)
+    club = LiveStats(events, match_dates, club_info).club_snapshot()
+
+    def club_overview():
+        goals_assists_chart(club['all_data'], ['Total Goals', 'Total Assists'], "Goals and Assists Over Time")
+        top_players_chart(club['top_scorers'], "Top 5 Players with Goals", "Total Goals")
+        top_players_chart(club['top_assisters'], "Top 5 Players with Assists", "Total Assists")
+
+    results['club_overview_page (data + charts)'] = time_call(club_overview, repeat)
+
+    # Player Comparison: up to 25 players over the whole history, then their overlaid heatmaps
+    compared = list(player_info['player_name'].iloc[:COMPARED_PLAYERS])
+
+    def comparison():
+        summary, form = compare_players(leaderboard, compared)
+        comparison_chart(summary, ['Goals', 'Assists'], "Goals and Assists", "Total")
+        form_chart(form_chart_data(form), "Form", "Goals + Assists")
+
+    results[f'comparison_page (data + charts, {len(compared)} players)'] = time_call(comparison, repeat)
+    grids = {player: heatmap_grids[player] for player in compared}
+    results[f'comparison_page (heatmap overlay, {len(compared)} players)'] = time_call(lambda: render_overlay(grids), repeat)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(players, matches, repeat, max_cells, max_workbook_cells):
+    """
+    Benchmarks every squad size and returns the report as a dict.
+    """
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+        },
+        'results': [],
+    }
+    for n_players in players:
+        for n_matches in matches:
+            if n_players * n_matches > max_cells:
+                print(f'Skipping {n_players} players x {n_matches} matches (over {max_cells} cells)', file=sys.stderr)
+                continue
+            print(f'Benchmarking {n_players} players x {n_matches} matches', file=sys.stderr)
+            for name, runs in benchmark_squad(n_players, n_matches, repeat, max_workbook_cells).items():
+                result = {'name': name, 'players': n_players, 'matches': n_matches}
+                if isinstance(runs, str):
+                    result['skipped'] = runs
+                else:
+                    result.update({'runs': runs, 'min': min(runs), 'median': statistics.median(runs)})
+                report['results'].append(result)
+    return report
+
+
+def compare(report, baseline, threshold):
+    """
+    Returns the cases whose median time grew by more than threshold times compared to the baseline.
+    """
+    key = lambda r: (r['name'], r['players'], r['matches'])
+    baseline = {key(r): r for r in baseline['results'] if 'median' in r}
+    regressions = []
+    for result in report['results']:
+        old = baseline.get(key(result))
+        if 'median' not in result or old is None or old['median'] == 0:
+            continue
+        ratio = result['median'] / old['median']
+        if ratio > threshold:
+            regressions.append({'name': result['name'], 'players': result['players'], 'matches': result['matches'],
+                                'baseline': old['median'], 'median': result['median'], 'ratio': ratio})
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, nargs='+', default=DEFAULT_PLAYERS)
+    parser.add_argument('--matches', type=int, nargs='+', default=DEFAULT_MATCHES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-cells', type=int, default=2_000_000,
+                        help='skip squads whose goals sheet has more player x match cells than this')
+    parser.add_argument('--max-workbook-cells', type=int, default=200_000,
+                        help='only time the excel round trip of load_data below this many cells')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='JSON report of an earlier run to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='median slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    report = run(args.players, args.matches, args.repeat, args.max_cells, args.max_workbook_cells)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+        for r in report['regressions']:
+            print(f"Regression: {r['name']} ({r['players']} players x {r['matches']} matches) "
+                  f"{r['baseline']:.4f}s -> {r['median']:.4f}s ({r['ratio']:.2f}x)", file=sys.stderr)
+        exit_code = 1 if report['regressions'] else 0
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+import plotly.express as px
+
+
+def goals_assists_chart(data, y, title):
+    """
+    Line chart of goals and assists per match.
+    """
+    fig = px.line(
+        data,
+        x='Date',
+        y=y,
+        title=title,
+        labels={"value": "Count", "Date": "Match Date"},
+    )
+    return fig
+
+
+def top_players_chart(top_players, title, value_label):
+    """
+    Horizontal bar chart of the Name/Value frame returned by Leaderboard.top.
+    """
+    # Plot horizontal bar chart using Plotly
+    fig = px.bar(
+        top_players,
+        x="Value",  # Total goals or assists
+        y="Name",  # Player names
+        orientation="h",  # Horizontal orientation
+        title=title,
+        labels={"Value": value_label, "Name": "Player"},
+        # color="Value",  # Color by total goals
+        # color_continuous_scale="YlOrBr"  # Yellow to brown color scale
+    )
+    # Update layout for better visualization
+    fig.update_layout(
+        xaxis_title=value_label,
+        yaxis_title="Player",
+        yaxis=dict(categoryorder="total ascending"),  # Sort y-axis by total goals
+        template="plotly_dark"  # Dark theme
+    )
+
+    fig.update_traces(marker_color='#00ff80')
+    return fig
+
+
+def comparison_chart(summary, columns, title, value_label):
+    """
+    Grouped bar chart of some columns of the comparison summary, one group per player.
+    """
+    data = summary[columns].reset_index().melt(id_vars='Player', var_name='Metric', value_name='Value')
+    fig = px.bar(
+        data,
+        x="Player",
+        y="Value",
+        color="Metric",
+        barmode="group",
+        title=title,
+        labels={"Value": value_label},
+        template="plotly_dark",
+    )
+    return fig
+
+
+def form_chart(form_data, title, value_label):
+    """
+    Line chart of each player's rolling form, one line per player.
+    """
+    fig = px.line(
+        form_data,
+        x="Date",
+        y="Form",
+        color="Player",
+        title=title,
+        labels={"Form": value_label, "Date": "Match Date"},
+        template="plotly_dark",
+    )
+    return fig
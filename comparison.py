@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from timeline import CHART_POINTS
+
+# Matches summed into a player's rolling form
+FORM_MATCHES = 5
+
+
+def compare_players(leaderboard, players, start=None, end=None, form_matches=FORM_MATCHES):
+    """
+    Compares players over the matches between two dates, both inclusive.
+
+    Every metric comes from one match by player matrix, so the cost grows with the size of the
+    window and not with a loop over the players. Rates are per club match in the window.
+    Returns a frame of totals, rates and current form indexed by player, and a frame of each
+    player's goal contributions over their last form_matches matches, indexed by match date.
+    """
+    dates, (goals, assists) = leaderboard.match_matrix(players, start, end)
+    contributions = goals + assists
+    matches = max(len(dates), 1)
+
+    # Rolling sums as differences of one prefix sum down the matches
+    prefix = np.vstack([np.zeros((1, len(players)), dtype=contributions.dtype), np.cumsum(contributions, axis=0)])
+    ends = np.arange(1, len(dates) + 1)
+    form = prefix[ends] - prefix[np.maximum(ends - form_matches, 0)]
+
+    summary = pd.DataFrame({
+        'Goals': goals.sum(axis=0),
+        'Assists': assists.sum(axis=0),
+        'Goal Contributions': contributions.sum(axis=0),
+        'Goals per Match': goals.sum(axis=0) / matches,
+        'Assists per Match': assists.sum(axis=0) / matches,
+        'Contributions per Match': contributions.sum(axis=0) / matches,
+        f'Form (last {form_matches})': form[-1] if len(dates) else np.zeros(len(players), dtype=np.int64),
+    }, index=pd.Index(players, name='Player'))
+    return summary, pd.DataFrame(form, index=pd.Index(dates, name='Date'), columns=players)
+
+
+def form_chart_data(form, max_points=CHART_POINTS):
+    """
+    Returns the rolling form to plot, in long format. Long windows keep evenly spaced matches,
+    always including the latest, which is enough for a series that is already smoothed.
+    """
+    if len(form) > max_points:
+        form = form.iloc[np.unique(np.linspace(0, len(form) - 1, max_points).round().astype(int))]
+    return form.reset_index().melt(id_vars='Date', var_name='Player', value_name='Form')
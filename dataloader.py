@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+try:
+    import fcntl
+except ImportError: # not on Windows, where only the threads of one process are serialised
+    fcntl = None
+
+# Workbook maintained by the club and the folder holding its columnar copy
+EXCEL_FILE = 'data/tmb_fc_data.xlsx'
+CACHE_DIR = 'data/.cache'
+SHEETS = ['player_info', 'goals', 'assists', 'club_info']
+MANIFEST = 'manifest.json'
+LOCK_FILE = '.lock'
+
+# Schema metadata key listing the columns that mix numbers and text (e.g. squad number 'TBC')
+MIXED_COLUMNS_KEY = b'tmb_mixed_columns'
+
+# Held with the lock file while the cache is checked and rebuilt, for the threads of this process
+_rebuild_lock = threading.Lock()
+
+
+def workbook_hash(excel_file=EXCEL_FILE):
+    """
+    Returns the sha256 digest of the workbook contents.
+    """
+    digest = hashlib.sha256()
+    with open(excel_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(cache_dir=CACHE_DIR):
+    """
+    Returns the manifest describing the cached workbook, or None if there is no cache.
+    """
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _tmp_path(path):
+    # Unique to the writer, so concurrent writers never rename each other's file
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def _write_manifest(manifest, cache_dir):
+    path = os.path.join(cache_dir, MANIFEST)
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def rebuild_lock(cache_dir=CACHE_DIR):
+    """
+    Lets one caller at a time check and rebuild the cache: one thread of this process,
+    and one process on the host through a lock file in the cache folder.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with _rebuild_lock, open(os.path.join(cache_dir, LOCK_FILE), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def cache_is_fresh(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR):
+    """
+    Checks whether the cache matches the workbook.
+    The mtime and size are compared first; the contents are only hashed when they differ.
+    """
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        return False
+    if not all(os.path.exists(os.path.join(cache_dir, f'{sheet}.feather')) for sheet in manifest['sheets']):
+        return False
+
+    stat = os.stat(excel_file)
+    if manifest['mtime_ns'] == stat.st_mtime_ns and manifest['size'] == stat.st_size:
+        return True
+
+    # The file was touched, but the contents may still be the same
+    if manifest['sha256'] == workbook_hash(excel_file):
+        manifest['mtime_ns'], manifest['size'] = stat.st_mtime_ns, stat.st_size
+        _write_manifest(manifest, cache_dir)
+        return True
+    return False
+
+
+def _to_arrow(data):
+    """
+    Converts a sheet to an arrow table.
+    Object columns arrow cannot type (numbers mixed with text) are stored as text and restored on read.
+    """
+    data = data.copy()
+    mixed_columns = []
+    for col in data.columns[data.dtypes == object]:
+        try:
+            pa.array(data[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            data[col] = data[col].map(lambda v: v if pd.isna(v) else str(v))
+            mixed_columns.append(col)
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[MIXED_COLUMNS_KEY] = json.dumps(mixed_columns).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _restore_value(value):
+    if not isinstance(value, str):
+        return value
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _from_arrow(table):
+    data = table.to_pandas()
+    # Arrow returns None for empty text cells, whereas the app expects NaN like read_excel gives
+    for col in data.columns[data.dtypes == object]:
+        data[col] = data[col].map(lambda v: np.nan if v is None else v)
+    mixed_columns = json.loads((table.schema.metadata or {}).get(MIXED_COLUMNS_KEY, b'[]'))
+    for col in mixed_columns:
+        data[col] = data[col].map(_restore_value).astype(object)
+    return data
+
+
+def build_cache(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR):
+    """
+    Parses the workbook once and writes every sheet to an uncompressed feather file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = os.stat(excel_file)
+    sha256 = workbook_hash(excel_file)
+
+    sheets = pd.read_excel(excel_file, sheet_name=SHEETS)
+    for sheet, data in sheets.items():
+        path = os.path.join(cache_dir, f'{sheet}.feather')
+        tmp_path = _tmp_path(path)
+        feather.write_feather(_to_arrow(data), tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+
+    # The manifest is written last so a half-built cache is never treated as fresh
+    manifest = {'source': excel_file, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                'sha256': sha256, 'sheets': SHEETS}
+    _write_manifest(manifest, cache_dir)
+    return manifest
+
+
+def invalidate_cache(cache_dir=CACHE_DIR):
+    """
+    Removes the cached sheets so the next load rebuilds them from the workbook.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        if name == MANIFEST or name.endswith('.feather'):
+            os.remove(os.path.join(cache_dir, name))
+
+
+def ensure_fresh(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR):
+    """
+    Rebuilds the cache if it is stale. When several sessions find it stale at once,
+    one rebuilds it and the others find it fresh once they get the lock.
+    """
+    if cache_is_fresh(excel_file, cache_dir):
+        return
+    with rebuild_lock(cache_dir):
+        if not cache_is_fresh(excel_file, cache_dir):
+            build_cache(excel_file, cache_dir)
+
+
+def data_version(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR):
+    """
+    Returns a short identifier of the workbook contents, rebuilding the cache if it is stale.
+    """
+    ensure_fresh(excel_file, cache_dir)
+    return read_manifest(cache_dir)['sha256'][:16]
+
+
+def load_sheets(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR, sheets=SHEETS):
+    """
+    Loads the workbook sheets from the columnar cache, memory-mapping the feather files.
+    openpyxl is only used when the cache is missing or stale.
+    """
+    ensure_fresh(excel_file, cache_dir)
+
+    return {sheet: _from_arrow(feather.read_table(os.path.join(cache_dir, f'{sheet}.feather'), memory_map=True))
+            for sheet in sheets}
+
+
+def main(argv):
+    """
+    Command line entry point: python dataloader.py [status|rebuild|invalidate]
+    """
+    command = argv[0] if argv else 'status'
+    if command == 'rebuild':
+        with rebuild_lock():
+            invalidate_cache()
+            manifest = build_cache()
+        print(f"Rebuilt cache for {manifest['source']} (version {manifest['sha256'][:16]})")
+    elif command == 'invalidate':
+        invalidate_cache()
+        print(f'Removed cached sheets from {CACHE_DIR}')
+    elif command == 'status':
+        manifest = read_manifest()
+        if manifest is None:
+            print('No cache built yet')
+        else:
+            state = 'fresh' if cache_is_fresh() else 'stale'
+            print(f"Cache version {manifest['sha256'][:16]} is {state}")
+    else:
+        print(main.__doc__.strip())
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,96 @@
+from dummydata import generate_dummy_passes, DEFAULT_SEED
+from events import player_dtype, events_from_wide
+from stats import build_player_index
+
+
+def build_tables(sheets):
+    """
+    Builds the player and club tables from the workbook sheets.
+    """
+    player_info = sheets['player_info']
+    club_info = sheets['club_info']
+
+    # Convert the wide goals and assists sheets into the long-format event table
+    players = player_dtype(player_info, sheets['goals'], sheets['assists'])
+    events, match_dates = events_from_wide(sheets['goals'], sheets['assists'], players)
+
+    # create supporting tables
+    lineup = {pos: list(names) for pos, names in player_info.groupby('primary_position', sort=False)['player_name']} # Players of each position, in squad order
+    player_index = build_player_index(player_info) # Player summaries, looked up by name
+
+    return player_info, events, match_dates, club_info, lineup, player_index
+
+
+def build_passes(player_info, seed=DEFAULT_SEED):
+    """
+    Generates the pass data, the heatmap grids and the rows of each player's passes.
+    Only the player pages need these, so the plotting modules are imported here rather than at the top.
+    """
+    from heatmap import build_heatmap_grids
+    from passstore import compact_passes
+
+    passes_data = generate_dummy_passes(player_info[['player_name','primary_position']], seed=seed)
+    # Compact types, sorted by player so a player's passes are a slice found through pass_offsets
+    passes_data, pass_offsets = compact_passes(passes_data, players=player_info['player_name'].unique())
+    heatmap_grids = build_heatmap_grids(passes_data) # Smoothed pass histograms, looked up by name
+
+    return passes_data, heatmap_grids, pass_offsets
+
+
+def build_datasets(sheets, seed=DEFAULT_SEED):
+    """
+    Builds every table the app uses from the workbook sheets.
+    """
+    player_info, events, match_dates, club_info, lineup, player_index = build_tables(sheets)
+    passes_data, heatmap_grids, pass_offsets = build_passes(player_info, seed)
+
+    return player_info, events, match_dates, club_info, lineup, passes_data, player_index, heatmap_grids, pass_offsets
+
+
+def cached_tables(shared_cache, version):
+    """
+    Returns the tables of build_tables for a data version from the shared cache, building them on a miss.
+    """
+    from dataloader import load_sheets
+    return shared_cache.get_or_build('tables', version, lambda: build_tables(load_sheets()))
+
+
+def cached_passes(shared_cache, version):
+    """
+    Returns the pass data and heatmap grids for a data version from the shared cache, building them on a miss.
+    """
+    player_info = cached_tables(shared_cache, version)[0]
+    return shared_cache.get_or_build('passes', version, lambda: build_passes(player_info))
+
+
+def player_passes(shared_cache, version, player):
+    """
+    Returns a player's passes and their heatmap grid (None when it is left to the renderer).
+    Real passes are read from the player's partition of the pass store once any have been ingested;
+    until then the generated passes are used.
+    """
+    from passstore import has_passes, player_slice, read_player_passes
+
+    if has_passes():
+        return read_player_passes(player), None
+    passes_data, heatmap_grids, pass_offsets = cached_passes(shared_cache, version)
+    return player_slice(passes_data, pass_offsets, player), heatmap_grids.get(player)
+
+
+def players_heatmap_grids(shared_cache, version, players):
+    """
+    Returns a dict of player to heatmap grid for several players, from the same passes as player_passes.
+    Store passes of all of them are binned together in one batch.
+    """
+    import numpy as np
+    import pandas as pd
+    from heatmap import PITCH_BINS, build_heatmap_grids
+    from passstore import has_passes, read_player_passes
+
+    if has_passes():
+        passes = [read_player_passes(player) for player in players]
+        passes = [p.assign(player=p['player'].astype(str)) for p in passes if not p.empty]
+        heatmap_grids = build_heatmap_grids(pd.concat(passes, ignore_index=True)) if passes else dict()
+    else:
+        heatmap_grids = cached_passes(shared_cache, version)[1]
+    return {player: heatmap_grids.get(player, np.zeros(PITCH_BINS)) for player in players}
@@ -1,84 +1,107 @@
+import numpy as np
 import pandas as pd
-import random
+from dataloader import load_sheets
 # import matplotlib.pyplot as plt
 # from mplsoccer.pitch import Pitch
 # import seaborn as sns
 
-# Read in the data. Use this real data as a baseline to create dummy data.
-df = pd.read_csv('data/messibetis.csv')
-df = df[['player','x','y','outcome','endX','endY']]
+# Real data used as a baseline to create dummy data
+BASE_PASSES_FILE = 'data/messibetis.csv'
+
+# Seed used for the dummy passes so that every cold start produces the same data
+DEFAULT_SEED = 2023
+
+COORD_COLS = ['x', 'y', 'endX', 'endY']
+
+# Jitter rules for each position and coordinate:
+# (keep_above, keep_below, jitter_low, jitter_high, fallback_low, fallback_high)
+# A coordinate strictly between keep_above and keep_below is shifted by a random jitter,
+# anything else is replaced by a random value in the fallback range. All bounds are inclusive.
+POSITION_RULES = {
+    'FWD': {'x': (10, 100, -10, 10, 1, 100),
+            'y': (10, 100, -10, 10, 1, 100),
+            'endX': (10, 100, -10, 10, 1, 100),
+            'endY': (10, 100, -10, 10, 1, 100)},
+    'MID': {'x': (20, np.inf, -20, -5, 1, 90),
+            'y': (20, np.inf, -20, -5, 1, 90),
+            'endX': (20, np.inf, -20, -5, 1, 90),
+            'endY': (10, np.inf, -20, -5, 1, 90)},
+    'DEF': {'x': (40, np.inf, -40, -20, 1, 65),
+            'y': (40, np.inf, -40, -20, 1, 65),
+            'endX': (40, np.inf, -40, -20, 1, 65),
+            'endY': (40, np.inf, -40, -20, 1, 65)},
+    'GK': {'x': (10, np.inf, -40, -20, 1, 65),
+           'y': (40, np.inf, -40, -20, 1, 65),
+           'endX': (40, np.inf, -40, -20, 1, 65),
+           'endY': (40, np.inf, -40, -20, 1, 65)},
+}
+
+# Range of the per-player threshold used to randomise the pass outcome
+PASS_PERCENTAGE_RANGE = (10, 50)
+
+# Scale the 0-100 coordinates to fit the 120x80 statsbomb pitch
+PITCH_SCALE = {'x': 1.2, 'y': .8, 'endX': 1.2, 'endY': .8}
+
+
+def load_base_passes():
+    """
+    Reads in the real passes used as a baseline to create dummy data.
+    """
+    df = pd.read_csv(BASE_PASSES_FILE)
+    return df[['player','x','y','outcome','endX','endY']]
+
+
+def load_player_positions():
+    """
+    Gets all the player names and their primary positions.
+    """
+    player_info = load_sheets(sheets=['player_info'])['player_info']
+    return player_info[['player_name','primary_position']]
 
-# Get all the player names
-excel_file = 'data/tmb_fc_data.xlsx'
-player_info = pd.read_excel(excel_file, sheet_name='player_info')
-player_pos = player_info[['player_name','primary_position']]
 
-def generate_dummy_passes():
+def generate_dummy_passes(players=None, base_passes=None, seed=DEFAULT_SEED):
     """
-    Generates coordinates for dummy passes
+    Generates coordinates for dummy passes.
+    Every player gets a jittered copy of the baseline passes, computed for the whole squad in one batch.
     """
-    all_players_passes = pd.DataFrame()
-
-    for _, row in player_pos.iterrows():
-        if row['primary_position']=='FWD':
-            df_temp = df.copy()
-            # Change the player name
-            df_temp['player'] = row['player_name']
-
-            # Randomise coordinates
-            df_temp['x'] = df_temp['x'].apply(lambda i: random.randint(-10, 10)+i if i<100 and i>10 else random.randint(1, 100))
-            df_temp['y'] = df_temp['y'].apply(lambda i: random.randint(-10, 10)+i if i<100 and i>10 else random.randint(1, 100))
-            df_temp['endX'] = df_temp['endX'].apply(lambda i: random.randint(-10, 10)+i if i<100 and i>10 else random.randint(1, 100))
-            df_temp['endY'] = df_temp['endY'].apply(lambda i: random.randint(-10, 10)+i if i<100 and i>10 else random.randint(1, 100))
-        
-        if row['primary_position']=='MID':
-            df_temp = df.copy()
-            # Change the player name
-            df_temp['player'] = row['player_name']
-
-            # Randomise coordinates
-            df_temp['x'] = df_temp['x'].apply(lambda i: random.randint(-20, -5)+i if i>20 else random.randint(1, 90))
-            df_temp['y'] = df_temp['y'].apply(lambda i: random.randint(-20, -5)+i if i>20 else random.randint(1, 90))
-            df_temp['endX'] = df_temp['endX'].apply(lambda i: random.randint(-20, -5)+i if i>20 else random.randint(1, 90))
-            df_temp['endY'] = df_temp['endY'].apply(lambda i: random.randint(-20, -5)+i if i>10 else random.randint(1, 90))
-
-        if row['primary_position']=='DEF':
-            df_temp = df.copy()
-            # Change the player name
-            df_temp['player'] = row['player_name']
-
-            # Randomise coordinates
-            df_temp['x'] = df_temp['x'].apply(lambda i: random.randint(-40, -20)+i if i>40 else random.randint(1, 65))
-            df_temp['y'] = df_temp['y'].apply(lambda i: random.randint(-40, -20)+i if i>40 else random.randint(1, 65))
-            df_temp['endX'] = df_temp['endX'].apply(lambda i: random.randint(-40, -20)+i if i>40 else random.randint(1, 65))
-            df_temp['endY'] = df_temp['endY'].apply(lambda i: random.randint(-40, -20)+i if i>40 else random.randint(1, 65))
-
-        if row['primary_position']=='GK':
-            df_temp = df.copy()
-            # Change the player name
-            df_temp['player'] = row['player_name']
-
-            # Randomise coordinates
-            df_temp['x'] = df_temp['x'].apply(lambda i: random.randint(-40, -20)+i if i>10 else random.randint(1, 65))
-            df_temp['y'] = df_temp['y'].apply(lambda i: random.randint(-40, -20)+i if i>40 else random.randint(1, 65))
-            df_temp['endX'] = df_temp['endX'].apply(lambda i: random.randint(-40, -20)+i if i>40 else random.randint(1, 65))
-            df_temp['endY'] = df_temp['endY'].apply(lambda i: random.randint(-40, -20)+i if i>40 else random.randint(1, 65))
-
-
-        # Randomise outcome
-        pass_percentage = random.randint(10, 50)
-        df_temp['outcome'] = df_temp['outcome'].apply(lambda i: "Successful" if random.randint(1, 100)>=pass_percentage else "Unsuccessful")
-
-        all_players_passes = pd.concat([all_players_passes,df_temp])
-
-
-    # Adjust the coordinates to fit the heatmap
-    all_players_passes['x'] = all_players_passes['x']*1.2
-    all_players_passes['y'] = all_players_passes['y']*.8
-    all_players_passes['endX'] = all_players_passes['endX']*1.2
-    all_players_passes['endY'] = all_players_passes['endY']*.8
-
-    return all_players_passes
+    if players is None:
+        players = load_player_positions()
+    if base_passes is None:
+        base_passes = load_base_passes()
+
+    # Players in positions without a rule do not get any passes
+    players = players[players['primary_position'].isin(POSITION_RULES.keys())]
+    n_players, n_passes = len(players), len(base_passes)
+    rng = np.random.default_rng(seed)
+
+    # Position of every generated row, as an index into the rule table
+    positions = list(POSITION_RULES.keys())
+    pos_codes = np.repeat(players['primary_position'].map(positions.index).to_numpy(), n_passes)
+
+    all_players_passes = {'player': np.repeat(players['player_name'].to_numpy(), n_passes)}
+
+    for col in COORD_COLS:
+        # Look up the rule of every row for this coordinate
+        rules = np.array([POSITION_RULES[pos][col] for pos in positions], dtype=float)[pos_codes]
+        keep_above, keep_below, jitter_low, jitter_high, fallback_low, fallback_high = rules.T
+
+        # Randomise coordinates
+        values = np.tile(base_passes[col].to_numpy(dtype=float), n_players)
+        jitter = rng.integers(jitter_low, jitter_high + 1)
+        fallback = rng.integers(fallback_low, fallback_high + 1)
+        keep = (values > keep_above) & (values < keep_below)
+        all_players_passes[col] = np.where(keep, values + jitter, fallback) * PITCH_SCALE[col]
+
+    # Randomise outcome
+    pass_percentage = np.repeat(rng.integers(PASS_PERCENTAGE_RANGE[0], PASS_PERCENTAGE_RANGE[1] + 1, size=n_players), n_passes)
+    roll = rng.integers(1, 101, size=n_players * n_passes)
+    all_players_passes['outcome'] = np.where(roll >= pass_percentage, 'Successful', 'Unsuccessful')
+
+    # Build the frame once, keeping the baseline pass index for every player
+    all_players_passes = pd.DataFrame(all_players_passes, index=np.tile(base_passes.index.to_numpy(), n_players))
+
+    return all_players_passes[['player', 'x', 'y', 'outcome', 'endX', 'endY']]
+
 
 
 # def generate_heatmap(df_input, player_name):
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# Event types of the long-format table and the column they feed on the pages
+EVENT_TYPES = {'goal': 'Goals', 'assist': 'Assists'}
+EVENT_DTYPE = pd.CategoricalDtype(list(EVENT_TYPES))
+
+
+def player_dtype(player_info, *sheets):
+    """
+    Returns the categorical type used for player ids: the squad in player_info order,
+    followed by anyone who only appears as a column of the wide sheets.
+    """
+    names = list(player_info['player_name'])
+    known = set(names)
+    for sheet in sheets:
+        for name in sheet.columns.drop('Date'):
+            if name not in known:
+                names.append(name)
+                known.add(name)
+    return pd.CategoricalDtype(names)
+
+
+def empty_events(players):
+    return pd.DataFrame({
+        'match_date': pd.Series(dtype='datetime64[ns]'),
+        'player_id': pd.Series(dtype=players),
+        'event_type': pd.Series(dtype=EVENT_DTYPE),
+        'count': pd.Series(dtype='int16'),
+    })
+
+
+def events_from_wide(goals, assists, players):
+    """
+    Converts the wide goals and assists sheets (one column per player) into the long-format table.
+    Empty and zero cells are dropped. Returns the events and the sorted dates of every match in the sheets.
+    """
+    frames = []
+    for event_type, sheet in (('goal', goals), ('assist', assists)):
+        values = sheet.drop(columns='Date')
+        counts = np.nan_to_num(values.to_numpy(dtype=float))
+        rows, cols = np.nonzero(counts)
+        player_codes = players.categories.get_indexer(values.columns)
+        frames.append(pd.DataFrame({
+            'match_date': sheet['Date'].to_numpy()[rows],
+            'player_id': pd.Categorical.from_codes(player_codes[cols], dtype=players),
+            'event_type': pd.Categorical([event_type] * len(rows), dtype=EVENT_DTYPE),
+            'count': counts[rows, cols].astype('int16'),
+        }))
+
+    events = pd.concat([empty_events(players)] + frames, ignore_index=True)
+    match_dates = pd.DatetimeIndex(goals['Date']).union(pd.DatetimeIndex(assists['Date'])).rename('Date')
+    return events, match_dates
+
+
+def events_from_rows(rows, players):
+    """
+    Converts rows of the match store (match_date, player, event_type, count) into the long-format table.
+    Players missing from the categories are added at the end.
+    """
+    missing = pd.Index(rows['player'].unique()).difference(players.categories)
+    if len(missing):
+        players = pd.CategoricalDtype(list(players.categories) + list(missing))
+    return pd.DataFrame({
+        'match_date': pd.to_datetime(rows['match_date']),
+        'player_id': rows['player'].astype(players),
+        'event_type': rows['event_type'].astype(EVENT_DTYPE),
+        'count': rows['count'].astype('int16'),
+    })
+
@@ -0,0 +1,278 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+from mplsoccer.pitch import Pitch
+import numpy as np
+import pandas as pd
+from scipy.ndimage import gaussian_filter
+import seaborn as sns
+
+# Same options st.pyplot uses, so cached images look identical to the live figure
+PNG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200, 'format': 'png'}
+
+# Ways of drawing the heatmap: a smoothed 2D histogram, or seaborn's kernel density estimate
+HEATMAP_ENGINES = ['histogram', 'kde']
+
+# One bin per unit of the 120x80 statsbomb pitch, smoothed with a gaussian of this many bins
+PITCH_BINS = (120, 80)
+PITCH_RANGE = ((0, 120), (0, 80))
+SMOOTHING_SIGMA = 8
+
+# Pitch coordinates of the centre of each bin
+GRID_CENTRES = (np.linspace(*PITCH_RANGE[0], PITCH_BINS[0] + 1)[:-1] + .5,
+                np.linspace(*PITCH_RANGE[1], PITCH_BINS[1] + 1)[:-1] + .5)
+
+# Share of the peak below which the histogram is left transparent, like the lowest kde level
+LOWEST_LEVEL = .1
+
+# Share of each player's peak outlined when several heatmaps are overlaid
+OVERLAY_LEVEL = .5
+
+# Colour of the pass lines for each outcome
+PASS_COLORS = {'Successful': 'green', 'Unsuccessful': 'red'}
+
+# Only one figure is drawn at a time; pyplot keeps global state and is not thread-safe
+_render_lock = threading.Lock()
+
+
+def passes_hash(player_passes):
+    """
+    Returns a digest of a player's passes, used to tell when their heatmap must be redrawn.
+    """
+    row_hashes = pd.util.hash_pandas_object(player_passes, index=False).to_numpy()
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def build_heatmap_grids(passes_data):
+    """
+    Bins and smooths the pass origins of every player in one batch.
+    Returns a dict of player name to a grid of shape PITCH_BINS scaled to a peak of 1.
+    """
+    players = pd.Categorical(passes_data['player'])
+    counts, _ = np.histogramdd(
+        (players.codes, passes_data['x'].to_numpy(), passes_data['y'].to_numpy()),
+        bins=(len(players.categories), *PITCH_BINS),
+        range=((-.5, len(players.categories) - .5), *PITCH_RANGE),
+    )
+    # Smooth each player's grid, but never across players
+    grids = gaussian_filter(counts, sigma=(0, SMOOTHING_SIGMA, SMOOTHING_SIGMA), mode='constant')
+    peaks = grids.max(axis=(1, 2), keepdims=True)
+    grids = np.divide(grids, peaks, out=np.zeros_like(grids), where=peaks > 0)
+    return dict(zip(players.categories, grids))
+
+
+def heatmap_grid(player_passes):
+    """
+    Returns the smoothed histogram grid of a single player's passes.
+    """
+    if player_passes.empty:
+        return np.zeros(PITCH_BINS)
+    grids = build_heatmap_grids(player_passes)
+    return next(iter(grids.values()), np.zeros(PITCH_BINS))
+
+
+def draw_pitch():
+    """
+    Draws an empty statsbomb pitch and returns the figure, axes and pitch.
+    """
+    fig ,ax = plt.subplots(figsize=(13.5,8))
+    fig.set_facecolor('#1C1C1C')
+    ax.patch.set_facecolor('#1C1C1C')
+
+    #this is how we create the pitch
+    pitch = Pitch(pitch_type='statsbomb',
+                pitch_color='#4ccf4c',
+                line_color='#eeffee',
+                )
+
+    #Draw the pitch on the ax figure as well as invert the axis for this specific pitch
+    pitch.draw(ax=ax)
+    ax.invert_yaxis()
+    return fig, ax, pitch
+
+
+def draw_heatmap(player_passes, show_passes, engine='kde', grid=None):
+    """
+    Draws the heatmap of a player's passes on a statsbomb pitch and returns the figure.
+    The 'histogram' engine uses the precomputed grid when given one.
+    """
+    fig, ax, pitch = draw_pitch()
+
+    #Create the heatmap
+    if engine == 'histogram':
+        if grid is None:
+            grid = heatmap_grid(player_passes)
+        # Filled contours over the precomputed grid, with the same levels and colours as the kde
+        ax.contourf(*GRID_CENTRES, grid.T, levels=np.linspace(LOWEST_LEVEL, 1, 10),
+                    cmap='magma', alpha=.5)
+    else:
+        kde = sns.kdeplot(
+                x=player_passes['x'],
+                y=player_passes['y'],
+                fill = True,
+                shade_lowest=False,
+                alpha=.5,
+                n_levels=10,
+                cmap = 'magma', ax=ax
+        )
+
+    ax.set_xlim(0,120)
+    ax.set_ylim(0,80)
+
+    if show_passes:
+        draw_passes(pitch, ax, player_passes)
+
+    return fig
+
+
+def draw_passes(pitch, ax, player_passes):
+    """
+    Draws the passes with one line collection and one scatter per outcome,
+    so the number of artists does not grow with the number of passes.
+    """
+    for outcome, color in PASS_COLORS.items():
+        passes = player_passes[player_passes['outcome'] == outcome]
+        if passes.empty:
+            continue
+        pitch.lines(passes['x'].to_numpy(), passes['y'].to_numpy(),
+                    passes['endX'].to_numpy(), passes['endY'].to_numpy(),
+                    color=color, lw=1.5, ax=ax)
+        pitch.scatter(passes['x'].to_numpy(), passes['y'].to_numpy(), color=color, ax=ax)
+
+
+def draw_overlaid_heatmaps(grids):
+    """
+    Draws the histogram heatmaps of several players on one pitch and returns the figure.
+    Each player is the area above OVERLAY_LEVEL of their peak, outlined and lightly filled in their own colour.
+    """
+    fig, ax, _ = draw_pitch()
+    colors = plt.get_cmap('tab10' if len(grids) <= 10 else 'tab20')
+    handles = []
+    for i, (player, grid) in enumerate(grids.items()):
+        color = colors(i % colors.N)
+        handles.append(Line2D([0], [0], color=color, lw=2, label=player))
+        if grid.max() <= OVERLAY_LEVEL:
+            continue # no passes
+        ax.contourf(*GRID_CENTRES, grid.T, levels=[OVERLAY_LEVEL, 1], colors=[color], alpha=.2)
+        ax.contour(*GRID_CENTRES, grid.T, levels=[OVERLAY_LEVEL], colors=[color], linewidths=2)
+
+    ax.set_xlim(0,120)
+    ax.set_ylim(0,80)
+    ax.legend(handles=handles, loc='upper center', bbox_to_anchor=(.5, 0), ncol=min(len(handles), 5),
+              frameon=False, labelcolor='white')
+    return fig
+
+
+def render_overlay(grids):
+    """
+    Renders the overlaid heatmaps to PNG bytes.
+    """
+    with _render_lock:
+        fig = draw_overlaid_heatmaps(grids)
+        image = io.BytesIO()
+        fig.savefig(image, **PNG_OPTIONS)
+        plt.close(fig)
+    return image.getvalue()
+
+
+def render_heatmap(player_passes, show_passes, engine='kde', grid=None):
+    """
+    Renders the heatmap to PNG bytes.
+    """
+    with _render_lock:
+        fig = draw_heatmap(player_passes, show_passes, engine, grid)
+        image = io.BytesIO()
+        fig.savefig(image, **PNG_OPTIONS)
+        plt.close(fig)
+    return image.getvalue()
+
+
+class HeatmapCache:
+    """
+    LRU cache of rendered heatmap PNGs, capped by total size in bytes.
+    Entries are keyed by player, page mode, engine and a hash of the player's passes,
+    so a change in one player's passes only invalidates that player's images.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, backend=None):
+        self.max_bytes = max_bytes
+        self.backend = backend # optional store shared with the other app processes
+        self.size = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._images)
+
+    def get(self, player, show_passes, player_passes, engine='kde', grid=None):
+        """
+        Returns the PNG bytes of a player's heatmap, rendering it only on a cache miss.
+        """
+        key = (player, show_passes, engine, passes_hash(player_passes))
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+
+        # Another process may already have rendered it
+        name = f'heatmap/{player}/{"passes" if show_passes else "plain"}/{engine}'
+        image = self.backend.get(name, key[-1]) if self.backend is not None else None
+        if image is not None:
+            with self._lock:
+                self.shared_hits += 1
+        else:
+            image = render_heatmap(player_passes, show_passes, engine, grid)
+            if self.backend is not None:
+                self.backend.put(name, key[-1], image)
+            with self._lock:
+                self.misses += 1
+
+        self.put(key, image)
+        return image
+
+    def get_overlay(self, grids):
+        """
+        Returns the PNG bytes of several players' heatmaps overlaid, rendering it only on a cache miss.
+        Keyed by the players and their grids, and kept in memory only.
+        """
+        digest = hashlib.sha1(np.stack(list(grids.values())).tobytes()).hexdigest() if grids else ''
+        key = ('overlay', tuple(grids), digest)
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+
+        image = render_overlay(grids)
+        with self._lock:
+            self.misses += 1
+        self.put(key, image)
+        return image
+
+    def put(self, key, image):
+        """
+        Stores an image, dropping older images of the same player, mode and engine and then the least recently used ones.
+        """
+        with self._lock:
+            for old_key in [k for k in self._images if k[:-1] == key[:-1] and k != key]:
+                self.size -= len(self._images.pop(old_key))
+            if key in self._images:
+                self.size -= len(self._images.pop(key))
+            self._images[key] = image
+            self.size += len(image)
+            while self.size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.size = 0
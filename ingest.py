@@ -0,0 +1,383 @@
+"""
+Adds single match results to the app without editing the workbook.
+
+    python ingest.py --date 2025-01-18 --scorers "Khalis:2, Hafiz" --assisters Faris --result win
+    python ingest.py --file matches.csv
+
+A file has one match per row with the columns date, scorers, assisters and result
+(CSV), or the same keys per line (JSON lines). Scorers and assisters are written as
+"name" or "name:count", separated by commas or semicolons.
+
+Matches are appended to a long-format store (one row per player, event type and match),
+which the app tails, so an update costs time in the size of the new rows only.
+
+A match is known by its date. Matches on a date already in the workbook or the store are
+skipped, so ingesting the same file twice adds nothing. With --correction their goals and
+assists are added to that match instead, e.g. a missed scorer; its result is never counted twice.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from events import EVENT_TYPES, events_from_rows
+from leaderboard import Leaderboard, covers
+from stats import per_match, player_totals
+from timeline import Timeline
+
+MATCH_EVENTS_FILE = 'data/match_events.csv'
+MATCH_RESULTS_FILE = 'data/match_results.csv'
+STORE_COLUMNS = ['match_date', 'player', 'event_type', 'count']
+RESULT_COLUMNS = ['match_date', 'result']
+RESULTS = ['win', 'draw', 'loss']
+
+# Most club snapshots kept; a season's window moves as its matches arrive, leaving its old one unused
+SNAPSHOT_ENTRIES = 32
+
+
+def parse_contributors(value):
+    """
+    Turns 'Khalis:2, Faris', ['Khalis', 'Khalis'] or {'Khalis': 2} into a dict of name to count.
+    """
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return dict()
+    if isinstance(value, dict):
+        return {name: int(count) for name, count in value.items() if int(count)}
+    if isinstance(value, str):
+        value = [v for v in re.split(r'[,;]', value) if v.strip()]
+
+    contributors = dict()
+    for entry in value:
+        name, _, count = str(entry).partition(':')
+        name = name.strip()
+        contributors[name] = contributors.get(name, 0) + (int(count) if count.strip() else 1)
+    return contributors
+
+
+def match_rows(date, scorers=None, assisters=None, result=None, known_players=None):
+    """
+    Validates one match and returns its long-format event rows and result row.
+    """
+    match_date = pd.Timestamp(date).strftime('%Y-%m-%d')
+    if result is not None and result not in RESULTS:
+        raise ValueError(f"Result must be one of {', '.join(RESULTS)}, not {result!r}")
+
+    events = []
+    for event_type, contributors in zip(EVENT_TYPES, (scorers, assisters)):
+        for player, count in parse_contributors(contributors).items():
+            if known_players is not None and player not in known_players:
+                raise ValueError(f'Unknown player {player!r} in the {event_type}s of {match_date}')
+            if count < 0:
+                raise ValueError(f'Negative {event_type} count for {player!r} on {match_date}')
+            events.append([match_date, player, event_type, count])
+
+    results = [[match_date, result]] if result is not None else []
+    return events, results
+
+
+def _append_rows(path, columns, rows):
+    if not rows:
+        return
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def _stored_dates(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    return set(pd.read_csv(path, usecols=['match_date'], dtype=str)['match_date'])
+
+
+def ingest_matches(matches, known_players=None, known_dates=(), correction=False,
+                   events_file=MATCH_EVENTS_FILE, results_file=MATCH_RESULTS_FILE):
+    """
+    Appends matches, dicts with a date and optional scorers, assisters and result, to the long-format store.
+    Every match is validated before any is written, so a bad one does not leave half a file ingested.
+
+    Matches on a date already in the store, or in known_dates (the workbook's, as 'YYYY-MM-DD'), are
+    skipped, unless correction is set: then their goals and assists are added to that match. A result
+    is refused for a match that already has one. Returns the number of event rows added and the skipped dates.
+    """
+    known_dates = set(known_dates)
+    with_result = known_dates | _stored_dates(results_file)
+    existing = with_result | _stored_dates(events_file)
+
+    rows, skipped, seen = [], [], set()
+    for match in matches:
+        result = match.get('result')
+        result = None if result is None or pd.isna(result) or result == '' else result
+        events, results = match_rows(match['date'], match.get('scorers'), match.get('assisters'), result, known_players)
+        match_date = pd.Timestamp(match['date']).strftime('%Y-%m-%d')
+        if match_date in seen:
+            raise ValueError(f'The match of {match_date} is given twice')
+        seen.add(match_date)
+        if match_date in existing and not correction:
+            skipped.append(match_date)
+            continue
+        if results and match_date in with_result:
+            raise ValueError(f'The match of {match_date} already has a result')
+        rows.append((events, results))
+
+    for events, results in rows:
+        _append_rows(events_file, STORE_COLUMNS, events)
+        _append_rows(results_file, RESULT_COLUMNS, results)
+    return sum(len(events) for events, _ in rows), skipped
+
+
+def ingest_match(date, scorers=None, assisters=None, result=None, known_players=None, known_dates=(),
+                 correction=False, events_file=MATCH_EVENTS_FILE, results_file=MATCH_RESULTS_FILE):
+    """
+    Appends one match to the long-format store. Returns the number of event rows added,
+    0 if the match was skipped as already ingested.
+    """
+    match = {'date': date, 'scorers': scorers, 'assisters': assisters, 'result': result}
+    added, _ = ingest_matches([match], known_players, known_dates, correction, events_file, results_file)
+    return added
+
+
+def read_matches(path):
+    """
+    Reads matches to ingest from a CSV or JSON lines file.
+    """
+    if path.endswith(('.json', '.jsonl')):
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    return pd.read_csv(path, dtype=str).to_dict('records')
+
+
+def read_new_rows(path, offset):
+    """
+    Reads the complete rows appended to a store file since the byte offset.
+    Returns the rows as a DataFrame and the offset to continue from.
+    """
+    if not os.path.exists(path):
+        return None, offset
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        chunk = f.read()
+
+    # A row still being written has no line ending yet; leave it for the next read
+    end = chunk.rfind(b'\n') + 1
+    new_offset = max(offset, len(header)) + end
+    if end == 0:
+        return None, new_offset
+    return pd.read_csv(io.BytesIO(header + chunk[:end]), parse_dates=['match_date']), new_offset
+
+
+class LiveStats:
+    """
+    Player and club totals kept up to date with the matches appended to the store.
+    Built once from the workbook's event table; each refresh only reads and applies the new rows.
+    """
+
+    def __init__(self, events, match_dates, club_info,
+                 events_file=MATCH_EVENTS_FILE, results_file=MATCH_RESULTS_FILE):
+        self.events_file = events_file
+        self.results_file = results_file
+        self.players = events['player_id'].dtype
+
+        # The workbook part never changes; ingested matches are appended to a frame of their own
+        self._base_events = events
+        self._base_dates = match_dates
+        self._new_events = None
+        self._new_dates = pd.DatetimeIndex([])
+
+        # Running totals, and the leaderboard answering the top-N queries
+        self.leaderboard = Leaderboard(events, match_dates)
+        totals = player_totals(events)
+        self.club = {
+            'games_played': int(club_info['games_played'].iloc[0]),
+            'win': int(club_info['win'].iloc[0]),
+            'draw': int(club_info['draw'].iloc[0]),
+            'loss': int(club_info['loss'].iloc[0]),
+            'total_goals': int(totals['Goals'].sum()),
+            'total_assists': int(totals['Assists'].sum()),
+        }
+
+        # Built on first use, then updated in place as matches arrive
+        self._timelines = dict() # player, or None for the team -> Timeline
+        self._snapshots = dict() # (start, end) -> the period part of the club snapshot
+
+        self.version = 0
+        self._offsets = {events_file: 0, results_file: 0}
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """
+        Applies the rows appended to the store since the last refresh. Returns True if anything changed.
+        """
+        with self._lock:
+            rows, self._offsets[self.events_file] = read_new_rows(self.events_file, self._offsets[self.events_file])
+            results, self._offsets[self.results_file] = read_new_rows(self.results_file, self._offsets[self.results_file])
+            if rows is None and results is None:
+                return False
+            self.apply(rows, results)
+            return True
+
+    def apply(self, rows=None, results=None):
+        """
+        Adds rows of the match store and match results to the running totals, the timelines built so far
+        and the club snapshots. The work is in the size of the new rows; only the cached results whose
+        period covers a new match are dropped.
+        """
+        with self._lock:
+            events = None
+            dates = []
+            if rows is not None and not rows.empty:
+                events = events_from_rows(rows, self.players)
+                dates.append(events['match_date'].unique())
+
+                # Totals of the players involved
+                self.leaderboard.add(events)
+                new_totals = player_totals(events)
+                self.club['total_goals'] += int(new_totals['Goals'].sum())
+                self.club['total_assists'] += int(new_totals['Assists'].sum())
+
+                # Plain strings, since the chunks may carry different player categories
+                events = events.astype({'player_id': str})
+                self._new_events = events if self._new_events is None else \
+                    pd.concat([self._new_events, events], ignore_index=True)
+
+            if results is not None and not results.empty:
+                dates.append(results['match_date'].unique())
+                self.leaderboard.add_matches(results['match_date'])
+                counts = results['result'].value_counts()
+                for result in RESULTS:
+                    self.club[result] += int(counts.get(result, 0))
+                self.club['games_played'] += len(results)
+
+            if not dates:
+                return
+            dates = pd.DatetimeIndex(np.concatenate(dates)).unique().sort_values()
+            self._new_dates = self._new_dates.union(dates)
+
+            # A row for every new match, with 0 for the timelines without events in it
+            for player, timeline in self._timelines.items():
+                timeline.add(per_match(self._events_of(events, player), dates))
+            for key in [key for key in self._snapshots if covers(*key, dates)]:
+                del self._snapshots[key]
+            self.version += 1
+
+    def totals_of(self, player):
+        """
+        Returns the goals and assists of a player.
+        """
+        return self.leaderboard.totals_of(player)
+
+    def _timeline(self, player):
+        """
+        Builds the timeline of a player, or of the team for None, from the workbook and the ingested matches.
+        """
+        timeline = Timeline(per_match(self._events_of(self._base_events, player), self._base_dates))
+        if len(self._new_dates):
+            timeline.add(per_match(self._events_of(self._new_events, player), self._new_dates))
+        return timeline
+
+    def _events_of(self, events, player):
+        """
+        Returns the events of a player, all of them for None, and no events when there are none.
+        """
+        if events is None:
+            return self._base_events.iloc[:0]
+        return events if player is None else events[events['player_id'] == player]
+
+    def player_timeline(self, player):
+        """
+        Returns a player's goals and assists per match as a Timeline, for date-window totals and charts.
+        """
+        with self._lock:
+            if player not in self._timelines:
+                self._timelines[player] = self._timeline(player)
+            return self._timelines[player]
+
+    def team_timeline(self):
+        """
+        Returns the team's goals and assists per match as a Timeline.
+        """
+        return self.player_timeline(None)
+
+    def club_snapshot(self, start=None, end=None):
+        """
+        Returns everything Club Overview shows for a period as a dict. The period's totals, chart and
+        top players are built on first use and kept until a new match falls in the period, so a rerun
+        of the page only reads them.
+        """
+        with self._lock:
+            key = (start, end)
+            if key not in self._snapshots:
+                team_timeline = self.team_timeline()
+                totals = team_timeline.totals(start, end)
+                all_data, per = team_timeline.chart_data(start, end)
+                self._snapshots[key] = {
+                    'total_goals': totals['Goals'],
+                    'total_assists': totals['Assists'],
+                    'all_data': all_data.rename(columns={'Goals': 'Total Goals', 'Assists': 'Total Assists'}),
+                    'per': per,
+                    'top_scorers': self.top_players('Goals', start=start, end=end),
+                    'top_assisters': self.top_players('Assists', start=start, end=end),
+                    'top_contributors': self.top_players('Goal Contributions', start=start, end=end),
+                }
+                if len(self._snapshots) > SNAPSHOT_ENTRIES:
+                    del self._snapshots[next(iter(self._snapshots))]
+            return {
+                # Results are only known as season totals, so they are all time
+                'games_played': self.club['games_played'],
+                'win': self.club['win'],
+                'draw': self.club['draw'],
+                'loss': self.club['loss'],
+                **self._snapshots[key],
+                'in_form': self.leaderboard.form('Goal Contributions'),
+            }
+
+    def top_players(self, column, n=5, start=None, end=None):
+        """
+        Returns the n players with the most goals, assists or goal contributions, optionally between two dates.
+        """
+        return self.leaderboard.top(column, n, start, end)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--date', help='match date, e.g. 2025-01-18')
+    parser.add_argument('--scorers', help='"name" or "name:count" entries separated by commas')
+    parser.add_argument('--assisters', help='"name" or "name:count" entries separated by commas')
+    parser.add_argument('--result', choices=RESULTS)
+    parser.add_argument('--file', help='CSV or JSON lines file with one match per row')
+    parser.add_argument('--correction', action='store_true',
+                        help='add to matches already in the workbook or the store instead of skipping them')
+    args = parser.parse_args(argv)
+
+    if args.file:
+        matches = read_matches(args.file)
+    elif args.date:
+        matches = [{'date': args.date, 'scorers': args.scorers, 'assisters': args.assisters, 'result': args.result}]
+    else:
+        parser.error('give either --date or --file')
+
+    from dataloader import load_sheets
+    sheets = load_sheets(sheets=['player_info', 'goals', 'assists'])
+    known_players = set(sheets['player_info']['player_name'])
+    known_dates = set(pd.DatetimeIndex(sheets['goals']['Date']).union(pd.DatetimeIndex(sheets['assists']['Date']))
+                      .strftime('%Y-%m-%d'))
+
+    added, skipped = ingest_matches(matches, known_players, known_dates, args.correction)
+    for match_date in skipped:
+        print(f'Skipped {match_date}: already in the workbook or ingested (--correction adds to it)', file=sys.stderr)
+    print(f'Ingested {len(matches) - len(skipped)} match(es), {added} event row(s)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,218 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Leaderboard metrics, as the weights of a player's goals and assists
+METRICS = {'Goals': (1, 0), 'Assists': (0, 1), 'Goal Contributions': (1, 1)}
+
+# Seasons run from August to July and are labelled like 2023/24
+SEASON_START_MONTH = 8
+
+
+def season_of(date):
+    """
+    Returns the label of the season a date falls in.
+    """
+    start_year = date.year if date.month >= SEASON_START_MONTH else date.year - 1
+    return f'{start_year}/{(start_year + 1) % 100:02d}'
+
+
+def season_windows(match_dates):
+    """
+    Returns a dict of season label to the (first, last) match date of that season, oldest season first.
+    """
+    windows = dict()
+    for date in match_dates:
+        season = season_of(date)
+        first, _ = windows.get(season, (date, date))
+        windows[season] = (first, date)
+    return windows
+
+
+def covers(start, end, dates):
+    """
+    Checks whether any of the sorted dates falls between start and end, both inclusive, None for an open end.
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), 'left')
+    hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), 'right')
+    return hi > lo
+
+
+class Leaderboard:
+    """
+    Per-player goal and assist totals answering top-N queries, all time or over a date window.
+
+    Events are kept sorted by date, so a window is a binary search and a bincount over its slice,
+    and the last few matches only touch the tail. All-time totals are kept up to date as matches
+    are added. Top-N uses partial selection, and results are cached until new matches fall in their window.
+    """
+
+    def __init__(self, events, match_dates):
+        self.players = np.asarray(events['player_id'].cat.categories, dtype=object)
+        self.match_dates = pd.DatetimeIndex(match_dates).sort_values()
+        self._dates = np.empty(0, dtype='datetime64[ns]')
+        self._codes = np.empty(0, dtype=np.int32)
+        self._counts = np.empty((len(METRICS['Goals']), 0), dtype=np.int32)
+        self._totals = np.zeros((len(METRICS['Goals']), len(self.players)), dtype=np.int64)
+        self._cache = dict()
+        self._lock = threading.RLock()
+        self.add(events)
+
+    def _player_codes(self, player_ids):
+        """
+        Maps player ids to codes of this leaderboard, adding players it has not seen yet.
+        """
+        names = np.asarray(player_ids, dtype=object)
+        codes = pd.Index(self.players).get_indexer(names)
+        if (codes < 0).any():
+            new_players = pd.unique(names[codes < 0])
+            self.players = np.concatenate([self.players, new_players])
+            self._totals = np.pad(self._totals, ((0, 0), (0, len(new_players))))
+            codes = pd.Index(self.players).get_indexer(names)
+        # Rank of every name in alphabetical order, to break ties the same way every time
+        self._name_rank = np.argsort(np.argsort(self.players.astype(str), kind='stable'))
+        return codes.astype(np.int32)
+
+    def add(self, events, match_dates=None):
+        """
+        Adds new events, and the dates of new matches without any, then drops the cached results they change.
+        """
+        with self._lock:
+            codes = self._player_codes(events['player_id'])
+            dates = events['match_date'].to_numpy(dtype='datetime64[ns]')
+            is_goal = (events['event_type'] == 'goal').to_numpy()
+            counts = events['count'].to_numpy(dtype=np.int32)
+            counts = np.vstack([np.where(is_goal, counts, 0), np.where(is_goal, 0, counts)])
+            for row in range(len(counts)):
+                self._totals[row] += np.bincount(codes, weights=counts[row], minlength=len(self.players)).astype(np.int64)
+            self.add_matches(dates if match_dates is None else np.concatenate([dates, pd.DatetimeIndex(match_dates).to_numpy()]))
+
+            # New matches are normally the latest, so they can simply go at the end
+            if len(dates) and len(self._dates) and dates.min() < self._dates[-1]:
+                dates = np.concatenate([self._dates, dates])
+                codes = np.concatenate([self._codes, codes])
+                counts = np.hstack([self._counts, counts])
+                order = np.argsort(dates, kind='stable')
+                self._dates, self._codes, self._counts = dates[order], codes[order], counts[:, order]
+            else:
+                order = np.argsort(dates, kind='stable')
+                self._dates = np.concatenate([self._dates, dates[order]])
+                self._codes = np.concatenate([self._codes, codes[order]])
+                self._counts = np.hstack([self._counts, counts[:, order]])
+
+    def add_matches(self, match_dates):
+        """
+        Adds the dates of new matches, with or without events, then drops the cached results
+        whose window covers any of them.
+        """
+        with self._lock:
+            match_dates = pd.DatetimeIndex(match_dates).unique().sort_values()
+            if not len(match_dates):
+                return
+            if len(match_dates.difference(self.match_dates)):
+                self.match_dates = self.match_dates.union(match_dates)
+                self._cache.pop('seasons', None)
+            # Keys are (metric, n, start, end)
+            for key in [k for k in self._cache if k != 'seasons' and covers(k[2], k[3], match_dates)]:
+                del self._cache[key]
+
+    def totals_of(self, player):
+        """
+        Returns the all-time goals and assists of a player.
+        """
+        with self._lock:
+            code = pd.Index(self.players).get_indexer([player])[0]
+            if code < 0:
+                return 0, 0
+            return int(self._totals[0, code]), int(self._totals[1, code])
+
+    def _window_counts(self, start=None, end=None):
+        """
+        Returns the goals and assists of every player between two dates, both inclusive.
+        """
+        if start is None and end is None:
+            return self._totals
+        lo = 0 if start is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start), 'ns'), 'left')
+        hi = len(self._dates) if end is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end), 'ns'), 'right')
+        codes, counts = self._codes[lo:hi], self._counts[:, lo:hi]
+        return np.vstack([np.bincount(codes, weights=row, minlength=len(self.players)) for row in counts]).astype(np.int64)
+
+    def match_matrix(self, players, start=None, end=None):
+        """
+        Returns the dates of the matches between two dates, both inclusive, and the goals and assists of
+        the given players in each, as an array of shape (2, matches, players). One bincount fills it.
+        """
+        with self._lock:
+            first = 0 if start is None else self.match_dates.searchsorted(pd.Timestamp(start), 'left')
+            last = len(self.match_dates) if end is None else self.match_dates.searchsorted(pd.Timestamp(end), 'right')
+            dates = self.match_dates[first:max(first, last)]
+            lo = 0 if start is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start), 'ns'), 'left')
+            hi = len(self._dates) if end is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end), 'ns'), 'right')
+            event_dates, codes, counts = self._dates[lo:hi], self._codes[lo:hi], self._counts[:, lo:hi]
+
+            # Column of each leaderboard code in the matrix, -1 for the players not asked for
+            columns = np.full(len(self.players), -1)
+            selected = pd.Index(self.players).get_indexer(players)
+            columns[selected[selected >= 0]] = np.flatnonzero(selected >= 0)
+            columns = columns[codes]
+            keep = columns >= 0
+
+        cells = dates.searchsorted(event_dates[keep]) * len(players) + columns[keep]
+        size = len(dates) * len(players)
+        matrix = np.stack([np.bincount(cells, weights=row[keep], minlength=size).reshape(len(dates), len(players))
+                           for row in counts]).astype(np.int64)
+        return dates, matrix
+
+    def _metric_values(self, metric, start=None, end=None):
+        return np.asarray(METRICS[metric]) @ self._window_counts(start, end)
+
+    def totals(self, start=None, end=None):
+        """
+        Returns every metric for every player as a frame indexed by name.
+        """
+        with self._lock:
+            return pd.DataFrame({metric: self._metric_values(metric, start, end) for metric in METRICS},
+                                index=pd.Index(self.players, name='Name'))
+
+    def top(self, metric, n=5, start=None, end=None):
+        """
+        Returns the n players with the highest metric, highest first, ties broken by name.
+        """
+        key = (metric, n, start, end)
+        with self._lock:
+            if key not in self._cache:
+                values = self._metric_values(metric, start, end)
+                n = min(n, len(values))
+                # Partial selection: only the players tied with or above the n-th value get sorted
+                kth = np.partition(values, len(values) - n)[len(values) - n] if n else np.inf
+                candidates = np.flatnonzero(values >= kth)
+                order = np.lexsort((self._name_rank[candidates], -values[candidates]))[:n]
+                best = candidates[order]
+                self._cache[key] = pd.DataFrame({'Name': self.players[best], 'Value': values[best]})
+            return self._cache[key]
+
+    def form(self, metric, n=5, last_matches=5):
+        """
+        Returns the n players with the highest metric over the last few matches.
+        """
+        with self._lock:
+            start = self.match_dates[-last_matches] if len(self.match_dates) >= last_matches else None
+        return self.top(metric, n, start=start)
+
+    def seasons(self):
+        """
+        Returns a dict of season label to the (first, last) match date of that season.
+        """
+        with self._lock:
+            if 'seasons' not in self._cache:
+                self._cache['seasons'] = season_windows(self.match_dates)
+            return self._cache['seasons']
+
+    def season_top(self, metric, season, n=5):
+        """
+        Returns the n players with the highest metric over one season.
+        """
+        start, end = self.seasons()[season]
+        return self.top(metric, n, start=start, end=end)
@@ -0,0 +1,395 @@
+"""
+Load-tests one app process with concurrent sessions and reports the cost of each page.
+
+    python loadtest.py
+    python loadtest.py --sessions 20 --actions 10 --players 40 --matches 300 --output load.json
+
+A synthetic workbook is written to a scratch folder and the app is started there with
+streamlit run, headless, so the club's data and caches are never touched: the shared cache
+is kept in the scratch folder whatever TMB_SHARED_CACHE says, and TMB_PROFILE is not passed
+on. The sessions connect to its websocket the way browsers do. Then, one page at a time, they all open the
+page and use it: a player is picked on Player Statistics, lineup buttons are clicked on
+Team Lineup (rerunning only their fragment), players are picked on Player Comparison and
+periods on Club Overview. Each session waits for its rerun to finish, then thinks for a
+random time before its next action.
+
+For each page the report gives the p50 and p95 rerun latency seen by the sessions, the
+CPU time of the server process, and its peak memory. CPU and memory are read from /proc,
+so they are only reported on Linux. By default one session visits every page first, so
+the numbers are for warm caches; --cold measures the first visits too.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+from profiling import PROFILE_ENV
+from sharedcache import SHARED_CACHE_DIR, SHARED_CACHE_ENV
+from startup_report import PAGES
+from synthetic import make_sheets, write_workbook
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Files the app reads relative to its working folder, besides the workbook
+APP_FILES = ['data/messibetis.csv', 'images']
+
+# Largest message the sessions accept, the same as the server's default limit
+MAX_MESSAGE_BYTES = 200 * 1024 * 1024
+
+# Most players a session picks on Player Comparison
+MAX_COMPARED = 25
+
+
+def make_app_dir(folder, n_players, n_matches, seed=0):
+    """
+    Lays out a working folder for the app with a synthetic workbook.
+    """
+    os.makedirs(os.path.join(folder, 'data'), exist_ok=True)
+    write_workbook(make_sheets(n_players, n_matches, seed), os.path.join(folder, 'data', 'tmb_fc_data.xlsx'))
+    for name in APP_FILES:
+        source, target = os.path.join(APP_DIR, name), os.path.join(folder, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, target)
+        else:
+            shutil.copy(source, target)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def start_server(folder, port, log, timeout=120):
+    """
+    Starts the app headless in folder and waits until it answers its health check.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [APP_DIR, os.environ.get('PYTHONPATH')])))
+    # The shared cache stays in the scratch folder too, whatever store this shell points the app at,
+    # and the runs are not slowed down by profiling
+    env[SHARED_CACHE_ENV] = f'dir:{os.path.join(folder, SHARED_CACHE_DIR)}'
+    env.pop(PROFILE_ENV, None)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', os.path.join(APP_DIR, 'tmb.py'),
+         '--server.headless', 'true', '--server.port', str(port), '--server.fileWatcherType', 'none',
+         '--browser.gatherUsageStats', 'false'],
+        cwd=folder, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'The app exited with code {server.returncode}, see {log.name}')
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1):
+                return server
+        except OSError:
+            time.sleep(.2)
+    server.terminate()
+    raise RuntimeError(f'The app did not start within {timeout}s, see {log.name}')
+
+
+class ServerStats:
+    """
+    CPU time and memory of the server process, read from /proc. Everything is None elsewhere.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.available = os.path.exists(f'/proc/{pid}/stat')
+
+    def cpu_seconds(self):
+        if not self.available:
+            return None
+        with open(f'/proc/{self.pid}/stat') as f:
+            # The fields after the command name; utime and stime are the 12th and 13th of them
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+    def _status_mb(self, field):
+        if not self.available:
+            return None
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+        return None
+
+    def rss_mb(self):
+        return self._status_mb('VmRSS')
+
+    def reset_peak(self):
+        """
+        Resets the peak memory to the current memory, so the next peak_mb is for one page.
+        """
+        if self.available:
+            with open(f'/proc/{self.pid}/clear_refs', 'w') as f:
+                f.write('5')
+
+    def peak_mb(self):
+        return self._status_mb('VmHWM')
+
+
+class Session:
+    """
+    One browser tab: a websocket to the app, the widgets of its last run and the values it has set.
+    """
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.page_hash = ''
+        self.widgets = dict() # id -> (element type, element proto, fragment id)
+        self.states = dict() # id -> WidgetState sent with every rerun
+        self.errors = []
+        self._messages = dict() # hash -> ForwardMsg, for the messages the server only refers to
+        self._ws = None
+
+    async def connect(self):
+        self._ws = await websocket_connect(self.url, max_message_size=MAX_MESSAGE_BYTES)
+        await self.rerun()
+
+    def close(self):
+        if self._ws is not None:
+            self._ws.close()
+
+    async def rerun(self, trigger=None, fragment_id=''):
+        """
+        Reruns the app, or one fragment, with the session's widget values and an optional button click.
+        Returns the time until the run finished, in seconds.
+        """
+        msg = BackMsg()
+        msg.rerun_script.page_script_hash = self.page_hash
+        msg.rerun_script.fragment_id = fragment_id
+        for state in self.states.values():
+            msg.rerun_script.widget_states.widgets.add().CopyFrom(state)
+        if trigger is not None:
+            msg.rerun_script.widget_states.widgets.add(id=trigger, trigger_value=True)
+
+        start = time.perf_counter()
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+        seen = await asyncio.wait_for(self._read_run(), self.timeout)
+        seconds = time.perf_counter() - start
+
+        if not fragment_id:
+            # Like the browser, forget the widgets the run no longer shows
+            self.states = {id: state for id, state in self.states.items() if id in seen}
+            self.widgets = {id: widget for id, widget in self.widgets.items() if id in seen}
+        return seconds
+
+    async def _read_run(self):
+        seen = set()
+        while True:
+            data = await self._ws.read_message()
+            if data is None:
+                raise ConnectionError('The app closed the connection')
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            if msg.metadata.cacheable:
+                self._messages[msg.hash] = msg
+            kind = msg.WhichOneof('type')
+            if kind == 'ref_hash':
+                msg = self._messages[msg.ref_hash]
+                kind = msg.WhichOneof('type')
+
+            if kind == 'new_session':
+                self.page_hash = msg.new_session.page_script_hash
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    self.errors.append(f'{element.exception.type}: {element.exception.message}')
+                proto = getattr(element, element_type)
+                if getattr(proto, 'id', ''):
+                    self.widgets[proto.id] = (element_type, proto, msg.delta.fragment_id)
+                    seen.add(proto.id)
+            elif kind == 'script_finished':
+                return seen
+
+    def find(self, element_type, label=None, key=None):
+        """
+        Returns the id, proto and fragment id of a widget of the last run, or None.
+        """
+        for id, (widget_type, proto, fragment_id) in self.widgets.items():
+            if widget_type == element_type and (label is None or proto.label == label) \
+                    and (key is None or id.endswith(f'-{key}')):
+                return id, proto, fragment_id
+        return None
+
+    async def choose(self, element_type, label, index, value_type='int_value'):
+        """
+        Sets a selectbox, radio or multiselect to the option(s) at index, then reruns.
+        """
+        id, _, fragment_id = self.find(element_type, label)
+        state = self.states.setdefault(id, BackMsg().rerun_script.widget_states.widgets.add(id=id))
+        if value_type == 'int_array_value':
+            state.int_array_value.data[:] = index
+        else:
+            setattr(state, value_type, index)
+        return await self.rerun(fragment_id=fragment_id)
+
+    async def open(self, page):
+        _, navigation, _ = self.find('radio', 'Go to')
+        return await self.choose('radio', 'Go to', list(navigation.options).index(page))
+
+
+async def click_lineup_player(session, rng):
+    buttons = [(id, fragment_id) for id, (widget_type, _, fragment_id) in session.widgets.items()
+               if widget_type == 'button' and '-lineup_' in id]
+    id, fragment_id = rng.choice(buttons)
+    return await session.rerun(trigger=id, fragment_id=fragment_id)
+
+
+async def pick_player(session, rng):
+    _, selectbox, _ = session.find('selectbox', 'Select a player')
+    return await session.choose('selectbox', 'Select a player', rng.randrange(len(selectbox.options)))
+
+
+async def pick_compared_players(session, rng):
+    _, multiselect, _ = session.find('multiselect', 'Select players')
+    count = rng.randint(2, min(MAX_COMPARED, len(multiselect.options)))
+    return await session.choose('multiselect', 'Select players', rng.sample(range(len(multiselect.options)), count),
+                                'int_array_value')
+
+
+async def pick_period(session, rng):
+    _, selectbox, _ = session.find('selectbox', 'Period')
+    return await session.choose('selectbox', 'Period', rng.randrange(len(selectbox.options) - 1)) # not Custom range
+
+
+async def refresh(session, rng):
+    return await session.rerun()
+
+
+# What a session does on each page after opening it
+PAGE_ACTIONS = {
+    "Team Lineup": click_lineup_player,
+    "Player Statistics": pick_player,
+    "Player Comparison": pick_compared_players,
+    "Club Overview": pick_period,
+}
+
+
+async def use_page(session, page, actions, think, rng, latencies):
+    latencies.append(await session.open(page))
+    for _ in range(actions):
+        await asyncio.sleep(rng.uniform(0, 2 * think))
+        latencies.append(await PAGE_ACTIONS.get(page, refresh)(session, rng))
+
+
+async def load_test(url, stats, pages, n_sessions, actions, think, seed, timeout, cold):
+    """
+    Runs every page with all the sessions at once. Returns the report of each page.
+    """
+    if not cold:
+        warmer = Session(url, timeout)
+        await warmer.connect()
+        for page in pages:
+            await use_page(warmer, page, 1, 0, random.Random(seed), [])
+        warmer.close()
+
+    sessions = [Session(url, timeout) for _ in range(n_sessions)]
+    await asyncio.gather(*(session.connect() for session in sessions))
+    rngs = [random.Random(seed + i) for i in range(n_sessions)]
+
+    report = []
+    for page in pages:
+        latencies = []
+        errors = sum(len(session.errors) for session in sessions)
+        stats.reset_peak()
+        cpu, start = stats.cpu_seconds(), time.perf_counter()
+        results = await asyncio.gather(*(use_page(session, page, actions, think, rng, latencies)
+                                         for session, rng in zip(sessions, rngs)), return_exceptions=True)
+        wall = time.perf_counter() - start
+        cpu = None if cpu is None else stats.cpu_seconds() - cpu
+        failures = [repr(r) for r in results if isinstance(r, BaseException)]
+
+        report.append({
+            'page': page,
+            'reruns': len(latencies),
+            'latency_p50_s': float(np.percentile(latencies, 50)) if latencies else None,
+            'latency_p95_s': float(np.percentile(latencies, 95)) if latencies else None,
+            'latency_max_s': max(latencies, default=None),
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'cpu_per_rerun_s': cpu / len(latencies) if cpu is not None and latencies else None,
+            'peak_rss_mb': stats.peak_mb(),
+            'app_errors': sum(len(session.errors) for session in sessions) - errors,
+            'failed_sessions': failures,
+        })
+        print_page(report[-1])
+    for session in sessions:
+        session.close()
+    return report
+
+
+def _format(value, unit, scale=1, digits=0):
+    return '     -' if value is None else f'{value * scale:6.{digits}f}{unit}'
+
+
+def print_page(result):
+    print(f"{result['page']:<18} {result['reruns']:4d} reruns  "
+          f"p50 {_format(result['latency_p50_s'], 'ms', 1000)}  p95 {_format(result['latency_p95_s'], 'ms', 1000)}  "
+          f"cpu {_format(result['cpu_s'], 's', digits=2)} ({_format(result['cpu_per_rerun_s'], 'ms', 1000)}/rerun)  "
+          f"peak {_format(result['peak_rss_mb'], 'MB')}"
+          + (f"  {result['app_errors']} app errors" if result['app_errors'] else '')
+          + (f"  {len(result['failed_sessions'])} sessions failed" if result['failed_sessions'] else ''),
+          file=sys.stderr)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10, help='concurrent sessions (default: 10)')
+    parser.add_argument('--actions', type=int, default=5, help='actions per session on each page (default: 5)')
+    parser.add_argument('--think', type=float, default=1.0, help='mean seconds between actions (default: 1)')
+    parser.add_argument('--players', type=int, default=25, help='players in the synthetic squad (default: 25)')
+    parser.add_argument('--matches', type=int, default=200, help='matches in the synthetic history (default: 200)')
+    parser.add_argument('--pages', nargs='+', choices=PAGES, default=PAGES, help='pages to load (default: all)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300, help='seconds a rerun may take (default: 300)')
+    parser.add_argument('--cold', action='store_true', help='do not warm the caches before measuring')
+    parser.add_argument('--output', help='also write the report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        make_app_dir(folder, args.players, args.matches, args.seed)
+        port = free_port()
+        with open(os.path.join(folder, 'server.log'), 'w') as log:
+            server = start_server(folder, port, log)
+            try:
+                stats = ServerStats(server.pid)
+                idle_mb = stats.rss_mb()
+                pages = asyncio.run(load_test(f'ws://localhost:{port}/_stcore/stream', stats, args.pages,
+                                              args.sessions, args.actions, args.think, args.seed, args.timeout,
+                                              args.cold))
+            finally:
+                server.terminate()
+                server.wait(30)
+
+    report = {
+        'meta': {'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                 'sessions': args.sessions, 'actions': args.actions, 'think_s': args.think,
+                 'players': args.players, 'matches': args.matches, 'cold': args.cold,
+                 'cpu_count': os.cpu_count(), 'idle_rss_mb': idle_mb},
+        'pages': pages,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(page['app_errors'] or page['failed_sessions'] for page in pages) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,458 @@
+"""
+Loads real pass events into a per-player columnar store, which the app reads one player at a time.
+
+    python passstore.py ingest match1.csv match2.csv --pitch 100x100
+    python passstore.py ingest 8657.json --team England
+    python passstore.py status
+    python passstore.py compact
+
+Input files are read in chunks, so they can be larger than memory:
+
+- CSV files with the columns of data/messibetis.csv (player, x, y, type, outcome, endX, endY,
+  and optionally minute and second). Coordinates are on a pitch of --pitch size, 100x100 by
+  default as in messibetis.csv. Rows whose type is not Pass are skipped.
+- StatsBomb event files: a JSON array of events, or one event per line. Only the passes of
+  --team (or of every team) are kept, and their coordinates are already on the 120x80 pitch.
+
+Coordinates are stored on the 120x80 statsbomb pitch the heatmaps are drawn on. Each player
+has a folder of Feather part files, added to by every ingest, so the app only opens the files
+of the player it shows. Ingested files are recorded by content hash and skipped if given again.
+
+The manifest publishes the parts: readers only open the parts of the files it lists, and
+the compacted files of the generation it names. An ingest or compaction is recorded once all
+its parts are written, so the app never shows half an ingest, even one that crashed. Ingests
+and compactions hold a lock on the store, so they run one at a time; readers need no lock.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+try:
+    import fcntl
+except ImportError: # not on Windows, where only the threads of one process are serialised
+    fcntl = None
+
+PASS_STORE_DIR = 'data/passes'
+STORE_MANIFEST = 'manifest.json'
+STORE_LOCK = '.lock'
+PLAYER_FOLDER_PREFIX = 'player='
+
+# Columns of the store, in the schema of messibetis.csv; the player is the folder a part is in
+PASS_COLUMNS = ['player', 'minute', 'second', 'x', 'y', 'type', 'outcome', 'endX', 'endY']
+PART_COLUMNS = [c for c in PASS_COLUMNS if c != 'player']
+
+# Pitch the app draws on, and the default pitch of CSV inputs
+STATSBOMB_PITCH = (120, 80)
+DEFAULT_CSV_PITCH = (100, 100)
+
+# Compact types of the pass columns: coordinates within a 120x80 pitch need no more than float32,
+# match times fit int16, and the repeated strings become categories
+PASS_DTYPES = {'minute': 'Int16', 'second': 'Int16', 'x': 'float32', 'y': 'float32',
+               'type': 'category', 'outcome': 'category', 'endX': 'float32', 'endY': 'float32'}
+
+# Rows read per chunk, and most rows buffered for one player before a part file is written
+CHUNK_ROWS = 100_000
+
+# Most rows buffered across all players; past it the largest buffers are written first
+BUFFER_ROWS = 1_000_000
+
+# Held with the lock file while the store is written to, for the threads of this process
+_store_lock = threading.Lock()
+
+
+def compact_passes(passes, players=None):
+    """
+    Converts passes to the compact types and sorts them by player, so each player's passes are one
+    contiguous slice. Returns the passes and a dict of player name to the (start, stop) rows of the slice.
+    Players are ordered as given, or alphabetically.
+    """
+    passes = passes.astype({column: dtype for column, dtype in PASS_DTYPES.items() if column in passes.columns})
+    player = passes['player'].astype(pd.CategoricalDtype(players) if players is not None else 'category')
+    codes = player.cat.codes.to_numpy()
+
+    # A stable sort keeps every player's passes in their original order
+    order = np.argsort(codes, kind='stable')
+    passes = passes.assign(player=player).iloc[order].reset_index(drop=True)
+
+    stops = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(player.cat.categories)))
+    starts = stops - np.bincount(codes[codes >= 0], minlength=len(player.cat.categories))
+    offsets = {name: (int(start), int(stop)) for name, start, stop in zip(player.cat.categories, starts, stops)}
+    return passes, offsets
+
+
+def player_slice(passes, offsets, player):
+    """
+    Returns the passes of one player from passes sorted by compact_passes, without scanning the others.
+    """
+    start, stop = offsets.get(player, (0, 0))
+    return passes.iloc[start:stop]
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(store_dir=PASS_STORE_DIR):
+    """
+    Returns the manifest of the store: its version and the files ingested so far.
+    """
+    try:
+        with open(os.path.join(store_dir, STORE_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'version': 0, 'sources': dict()}
+
+
+def _tmp_path(path):
+    # Unique to the writer, so concurrent writers never rename each other's file
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def _write_manifest(manifest, store_dir):
+    path = os.path.join(store_dir, STORE_MANIFEST)
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def store_lock(store_dir=PASS_STORE_DIR):
+    """
+    Lets one caller at a time change the store and its manifest: one thread of this process,
+    and one process on the host through a lock file in the store folder.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    with _store_lock, open(os.path.join(store_dir, STORE_LOCK), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _part_prefix(source_hash):
+    return f'part-{source_hash[:16]}-'
+
+
+def _compacted_name(generation):
+    return f'compacted-{generation:04d}.feather'
+
+
+def published_files(files, manifest):
+    """
+    Returns the part files of a player folder the manifest publishes: the parts of the ingested
+    files not yet compacted, and the compacted file of the current generation.
+    """
+    compacted = manifest.get('compacted')
+    merged = set(compacted['sources']) if compacted else set()
+    prefixes = tuple(_part_prefix(h) for h in manifest['sources'] if h not in merged)
+    return [file for file in files if file.endswith('.feather')
+            and (file.startswith(prefixes) or (compacted and file == _compacted_name(compacted['generation'])))]
+
+
+def has_passes(store_dir=PASS_STORE_DIR):
+    """
+    Checks whether any pass file has been ingested into the store.
+    """
+    return bool(read_manifest(store_dir)['sources'])
+
+
+def normalise_coordinates(passes, pitch):
+    """
+    Scales the coordinates from a pitch of the given (length, width) to the 120x80 statsbomb pitch.
+    """
+    scale_x = STATSBOMB_PITCH[0] / pitch[0]
+    scale_y = STATSBOMB_PITCH[1] / pitch[1]
+    for column, scale, bound in (('x', scale_x, 0), ('endX', scale_x, 0), ('y', scale_y, 1), ('endY', scale_y, 1)):
+        passes[column] = (passes[column].astype(float) * scale).clip(0, STATSBOMB_PITCH[bound])
+    return passes
+
+
+def read_csv_chunks(path, pitch=DEFAULT_CSV_PITCH, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the passes of a CSV file as frames of at most chunk_rows rows, on the statsbomb pitch.
+    """
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        if 'type' in chunk.columns:
+            chunk = chunk[chunk['type'] == 'Pass']
+        else:
+            chunk = chunk.assign(type='Pass')
+        for column in ('minute', 'second'):
+            if column not in chunk.columns:
+                chunk = chunk.assign(**{column: pd.NA})
+        chunk = chunk.dropna(subset=['player', 'x', 'y', 'endX', 'endY'])
+        yield normalise_coordinates(chunk[PASS_COLUMNS].copy(), pitch)
+
+
+def iter_json_events(path, chunk_bytes=1 << 20):
+    """
+    Yields the events of a JSON array or JSON lines file one at a time, reading chunk_bytes at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    with open(path, encoding='utf-8') as f:
+        while True:
+            # Skip what separates two events: whitespace, commas and the brackets of the array
+            while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+                position += 1
+            if position == len(buffer):
+                if eof:
+                    return
+                buffer, position = f.read(chunk_bytes), 0
+                eof = buffer == ''
+                continue
+            try:
+                event, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The event runs past the end of the buffer; read more and try again
+                more = f.read(chunk_bytes)
+                if more == '':
+                    raise
+                buffer, position = buffer[position:] + more, 0
+                continue
+            yield event
+            position = end
+
+
+def statsbomb_pass(event, team=None):
+    """
+    Returns a StatsBomb pass event as a row of PASS_COLUMNS, or None for any other event.
+    """
+    if event.get('type', {}).get('name') != 'Pass':
+        return None
+    if team is not None and event.get('team', {}).get('name') != team:
+        return None
+    start, end = event.get('location'), event.get('pass', {}).get('end_location')
+    if 'player' not in event or not start or not end:
+        return None
+    # StatsBomb only sets an outcome on passes that failed
+    outcome = 'Unsuccessful' if 'outcome' in event['pass'] else 'Successful'
+    return [event['player']['name'], event.get('minute'), event.get('second'),
+            start[0], start[1], 'Pass', outcome, end[0], end[1]]
+
+
+def read_statsbomb_chunks(path, team=None, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the passes of a StatsBomb event file as frames of at most chunk_rows rows.
+    """
+    rows = []
+    for event in iter_json_events(path):
+        row = statsbomb_pass(event, team)
+        if row is not None:
+            rows.append(row)
+        if len(rows) == chunk_rows:
+            yield normalise_coordinates(pd.DataFrame(rows, columns=PASS_COLUMNS), STATSBOMB_PITCH)
+            rows = []
+    if rows:
+        yield normalise_coordinates(pd.DataFrame(rows, columns=PASS_COLUMNS), STATSBOMB_PITCH)
+
+
+def _player_folder(player, store_dir):
+    return os.path.join(store_dir, PLAYER_FOLDER_PREFIX + quote(player, safe=''))
+
+
+def _to_part(passes):
+    passes = passes[PART_COLUMNS].astype({column: PASS_DTYPES[column] for column in PART_COLUMNS})
+    return pa.Table.from_pandas(passes, preserve_index=False)
+
+
+def _write_part(player, passes, store_dir, name):
+    folder = _player_folder(player, store_dir)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    tmp_path = _tmp_path(path)
+    feather.write_feather(_to_part(passes), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _remove_parts(store_dir, prefix):
+    for player in players(store_dir):
+        folder = _player_folder(player, store_dir)
+        for file in os.listdir(folder):
+            if file.startswith(prefix):
+                os.remove(os.path.join(folder, file))
+
+
+def ingest_file(path, store_dir=PASS_STORE_DIR, pitch=DEFAULT_CSV_PITCH, team=None, chunk_rows=CHUNK_ROWS,
+                buffer_rows=BUFFER_ROWS):
+    """
+    Streams the passes of a CSV or StatsBomb JSON file into the store. Returns the number of passes added.
+    At most buffer_rows passes are held in memory, however many players the file has.
+    """
+    with store_lock(store_dir):
+        return _ingest_file(path, store_dir, pitch, team, chunk_rows, buffer_rows)
+
+
+def _ingest_file(path, store_dir, pitch, team, chunk_rows, buffer_rows):
+    source_hash = _file_hash(path)
+    if source_hash in read_manifest(store_dir)['sources']:
+        return 0
+
+    # Parts left by an ingest of this file that did not finish were never published; they are replaced
+    prefix = _part_prefix(source_hash)
+    _remove_parts(store_dir, prefix)
+
+    if path.endswith(('.json', '.jsonl')):
+        chunks = read_statsbomb_chunks(path, team, chunk_rows)
+    else:
+        chunks = read_csv_chunks(path, pitch, chunk_rows)
+
+    # Passes are buffered per player, so a part file holds many chunks' worth of one player's passes
+    buffers, sizes, parts, total = dict(), dict(), dict(), 0
+    def flush(player):
+        passes = pd.concat(buffers.pop(player), ignore_index=True)
+        del sizes[player]
+        parts[player] = parts.get(player, 0) + 1
+        _write_part(player, passes, store_dir, f'{prefix}{parts[player]:04d}.feather')
+
+    for chunk in chunks:
+        total += len(chunk)
+        for player, passes in chunk.groupby('player', sort=False):
+            buffers.setdefault(player, []).append(passes)
+            sizes[player] = sizes.get(player, 0) + len(passes)
+            if sizes[player] >= chunk_rows:
+                flush(player)
+        while sum(sizes.values()) > buffer_rows:
+            flush(max(sizes, key=sizes.get))
+    for player in list(buffers):
+        flush(player)
+
+    # Recording the file publishes its parts
+    manifest = read_manifest(store_dir)
+    manifest['sources'][source_hash] = {'file': os.path.basename(path), 'passes': total, 'players': len(parts)}
+    manifest['version'] += 1
+    _write_manifest(manifest, store_dir)
+    return total
+
+
+def players(store_dir=PASS_STORE_DIR):
+    """
+    Returns the names of the players with passes in the store.
+    """
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(unquote(folder[len(PLAYER_FOLDER_PREFIX):]) for folder in os.listdir(store_dir)
+                  if folder.startswith(PLAYER_FOLDER_PREFIX))
+
+
+def _read_published(folder, manifest):
+    files = published_files(sorted(os.listdir(folder)), manifest) if os.path.isdir(folder) else []
+    return [feather.read_table(os.path.join(folder, file), memory_map=True) for file in files]
+
+
+def read_player_passes(player, store_dir=PASS_STORE_DIR, manifest=None):
+    """
+    Reads the passes of one player from their published part files only, memory-mapped.
+    Returns an empty frame with the store columns for a player without passes.
+    """
+    folder = _player_folder(player, store_dir)
+    try:
+        tables = _read_published(folder, read_manifest(store_dir) if manifest is None else manifest)
+    except FileNotFoundError:
+        # A compaction published a new generation and removed the parts it merged meanwhile
+        tables = _read_published(folder, read_manifest(store_dir))
+    if not tables:
+        passes = pd.DataFrame({column: pd.Series(dtype=PASS_DTYPES[column]) for column in PART_COLUMNS})
+    else:
+        # Parts written by different ingests have their own category dictionaries
+        passes = pa.concat_tables(tables, promote_options='permissive').unify_dictionaries().to_pandas()
+    passes.insert(0, 'player', pd.Categorical([player] * len(passes)))
+    return passes
+
+
+def compact(store_dir=PASS_STORE_DIR):
+    """
+    Merges each player's published part files into one compacted file of a new generation,
+    publishes the generation, then removes the files it replaces. Returns the number of files removed.
+    """
+    with store_lock(store_dir):
+        merged = _compact(store_dir)
+
+    # The replaced files are no longer published, so they are removed outside the lock
+    removed = 0
+    for player, files in merged.items():
+        for file in files:
+            os.remove(os.path.join(_player_folder(player, store_dir), file))
+        removed += len(files) - 1
+    return removed
+
+
+def _compact(store_dir):
+    """
+    Writes and publishes the next compacted generation. Returns a dict of player to the files it replaces.
+    """
+    manifest = read_manifest(store_dir)
+    compacted = manifest.get('compacted', {'generation': 0, 'sources': []})
+    if set(manifest['sources']) <= set(compacted['sources']):
+        return dict()
+    generation = compacted['generation'] + 1
+
+    merged = dict()
+    for player in players(store_dir):
+        folder = _player_folder(player, store_dir)
+        files = published_files(sorted(os.listdir(folder)), manifest)
+        if len(files) == 1:
+            # A single file is already compact; it is linked under the new generation's name, not copied
+            path = os.path.join(folder, _compacted_name(generation))
+            if os.path.exists(path):
+                os.remove(path)
+            os.link(os.path.join(folder, files[0]), path)
+        elif files:
+            _write_part(player, read_player_passes(player, store_dir, manifest), store_dir, _compacted_name(generation))
+        merged[player] = files
+
+    manifest['compacted'] = {'generation': generation, 'sources': list(manifest['sources'])}
+    manifest['version'] += 1
+    _write_manifest(manifest, store_dir)
+    return merged
+
+
+def _pitch(value):
+    length, _, width = value.lower().partition('x')
+    return float(length), float(width)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['ingest', 'status', 'compact'])
+    parser.add_argument('files', nargs='*', help='CSV or StatsBomb JSON files to ingest')
+    parser.add_argument('--pitch', type=_pitch, default=DEFAULT_CSV_PITCH,
+                        help='length x width of the CSV coordinates, e.g. 100x100 or 105x68')
+    parser.add_argument('--team', help='only keep the passes of this team from StatsBomb files')
+    parser.add_argument('--store', default=PASS_STORE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == 'ingest':
+        if not args.files:
+            parser.error('give the files to ingest')
+        for path in args.files:
+            added = ingest_file(path, args.store, args.pitch, args.team)
+            print(f'{path}: {added} passes' if added else f'{path}: already ingested or no passes')
+    elif args.command == 'compact':
+        print(f'Removed {compact(args.store)} part files')
+
+    manifest = read_manifest(args.store)
+    print(f"{args.store}: version {manifest['version']}, {len(manifest['sources'])} files ingested, "
+          f"{len(players(args.store))} players")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
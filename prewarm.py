@@ -0,0 +1,162 @@
+"""
+Fills the shared cache ahead of traffic, after a deploy or a data update.
+
+    python prewarm.py
+    python prewarm.py --workers 4 --engines histogram --output prewarm.json
+
+The tables and passes are loaded once into the shared cache. Then each player's heatmaps
+(for both pages and every engine) are rendered in a process pool, since matplotlib
+rendering is CPU-bound and not thread-safe. The heatmaps go to the shared store, so every
+app process on the host serves them without rendering. Heatmaps already in the store are
+not drawn again. Only these shared entries are warmed: the goals and assists series live
+in each app process and are built there on first use.
+
+Per-player timings are printed, slowest first, and players taking more than
+OUTLIER_FACTOR times the median are flagged.
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+# Players slower than this multiple of the median are flagged in the report
+OUTLIER_FACTOR = 2
+
+# Set in each worker process by _start_worker
+_worker = dict()
+
+
+def _start_worker(version):
+    import matplotlib
+    matplotlib.use('Agg')
+
+    # Imports are paid here, so they are not put on the first player of each worker
+    from datasets import cached_passes, cached_tables
+    from heatmap import HeatmapCache
+    from passstore import has_passes
+    from sharedcache import SharedCache, backend_from_env
+
+    # Each worker reads the tables and passes back from the store the parent filled, up front too
+    shared_cache = SharedCache(backend_from_env())
+    cached_tables(shared_cache, version)
+    if not has_passes():
+        cached_passes(shared_cache, version)
+    _worker['version'] = version
+    _worker['shared_cache'] = shared_cache
+    _worker['heatmap_cache'] = HeatmapCache(max_bytes=0, backend=backend_from_env())
+
+
+def warm_player(player, engines):
+    """
+    Renders one player's heatmaps into the shared store in a worker. Returns the time of each step in seconds.
+    """
+    from datasets import player_passes
+
+    heatmap_cache = _worker['heatmap_cache']
+    steps = dict()
+
+    # The same passes as the player pages, so the images land under the keys they look up
+    start = time.perf_counter()
+    passes, grid = player_passes(_worker['shared_cache'], _worker['version'], player)
+    steps['passes'] = time.perf_counter() - start
+
+    misses = heatmap_cache.misses
+    for engine in engines:
+        for show_passes in (False, True):
+            start = time.perf_counter()
+            heatmap_cache.get(player, show_passes, passes, engine, grid)
+            steps[f'heatmap {engine}' + (' + passes' if show_passes else '')] = time.perf_counter() - start
+
+    return {'player': player, 'total_s': sum(steps.values()), 'steps_s': steps,
+            'heatmaps_rendered': heatmap_cache.misses - misses}
+
+
+def prewarm(players=None, engines=None, workers=None):
+    """
+    Fills the shared cache for every player, or the given ones, and returns the report as a dict.
+    """
+    from dataloader import data_version
+    from datasets import cached_passes, cached_tables
+    from heatmap import HEATMAP_ENGINES
+    from passstore import has_passes
+    from sharedcache import SharedCache, backend_from_env
+
+    backend = backend_from_env()
+    if backend is None:
+        raise SystemExit('The shared cache is disabled (TMB_SHARED_CACHE=none), so there is nothing to warm')
+
+    version = data_version()
+    engines = engines or HEATMAP_ENGINES
+    shared_cache = SharedCache(backend)
+
+    start = time.perf_counter()
+    player_info = cached_tables(shared_cache, version)[0]
+    if not has_passes():
+        cached_passes(shared_cache, version)
+    load_s = time.perf_counter() - start
+    players = players or list(player_info['player_name'])
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                             initializer=_start_worker, initargs=(version,)) as pool:
+        futures = {pool.submit(warm_player, player, engines): player for player in players}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({'player': futures[future], 'error': repr(e)})
+    warm_s = time.perf_counter() - start
+
+    timed = [r['total_s'] for r in results if 'error' not in r]
+    median = statistics.median(timed) if timed else 0
+    for result in results:
+        result['outlier'] = 'error' not in result and result['total_s'] > OUTLIER_FACTOR * median
+    results.sort(key=lambda r: r.get('total_s', float('inf')), reverse=True)
+
+    return {
+        'meta': {'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                 'data_version': version, 'store': repr(backend), 'engines': list(engines),
+                 'workers': workers or os.cpu_count()},
+        'load_s': load_s,
+        'warm_s': warm_s,
+        'median_player_s': median,
+        'players': results,
+    }
+
+
+def print_report(report):
+    print(f"Loaded the tables and passes in {report['load_s']:.2f}s, warmed {len(report['players'])} players "
+          f"in {report['warm_s']:.2f}s (median {report['median_player_s']:.2f}s per player)")
+    for result in report['players']:
+        if 'error' in result:
+            print(f"  {result['player']:<20} FAILED {result['error']}")
+            continue
+        steps = ', '.join(f'{step} {seconds:.2f}s' for step, seconds in result['steps_s'].items())
+        flag = '  <- outlier' if result['outlier'] else ''
+        print(f"  {result['player']:<20} {result['total_s']:6.2f}s  ({steps}){flag}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', nargs='+', help='only warm these players')
+    parser.add_argument('--engines', nargs='+', help='heatmap engines to render (default: all)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--output', help='also write the report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    report = prewarm(args.players, args.engines, args.workers)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if any('error' in result for result in report['players']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
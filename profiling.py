@@ -0,0 +1,170 @@
+"""
+Opt-in timing of the app's reruns.
+
+Enabled for every session with TMB_PROFILE=1, or for one session by opening the app
+with ?profile=1. Named sections of each rerun are timed, and the hits and misses of the
+app's caches over the rerun are counted. The results show in a sidebar panel and are
+appended to PROFILE_LOG, one JSON line per rerun, for offline analysis.
+
+Sections nest, so a section's time includes the sections inside it. The cache counters
+are shared by every session, so under concurrent sessions a rerun's counts can include
+lookups of the others.
+
+When profiling is off, section() and watch() do nothing, and this module imports
+nothing heavier than the standard library.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_ENV = 'TMB_PROFILE'
+PROFILE_LOG = 'data/.cache/profile.jsonl'
+
+# Counters read from the caches being watched
+CACHE_COUNTERS = ['hits', 'shared_hits', 'misses']
+
+# The profiler of the rerun running in this thread, if any
+_current = threading.local()
+
+
+class Profiler:
+    """
+    The timed sections and cache counts of one rerun.
+    """
+
+    def __init__(self, page=None):
+        self.page = page
+        self.sections = [] # [name, depth, seconds], in the order the sections started
+        self.started = time.perf_counter()
+        self.total = None
+        self._depth = 0
+        self._watched = dict() # name -> (cache, counters when first watched)
+
+    @contextmanager
+    def section(self, name):
+        entry = [name, self._depth, None]
+        self.sections.append(entry)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry[2] = time.perf_counter() - start
+            self._depth -= 1
+
+    def watch(self, name, cache):
+        if name not in self._watched:
+            self._watched[name] = (cache, {c: getattr(cache, c) for c in CACHE_COUNTERS if hasattr(cache, c)})
+
+    def cache_counts(self):
+        """
+        Returns the hits and misses of every watched cache since it was first watched in this rerun.
+        """
+        return {name: {c: getattr(cache, c) - before for c, before in counters.items()}
+                for name, (cache, counters) in self._watched.items()}
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def record(self):
+        """
+        Returns the rerun as a dict.
+        """
+        return {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'page': self.page,
+            'total_s': self.total,
+            'sections': [{'name': name, 'depth': depth, 'seconds': seconds}
+                         for name, depth, seconds in self.sections],
+            'caches': self.cache_counts(),
+        }
+
+    def write(self, path=PROFILE_LOG):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.record()) + '\n')
+
+
+def is_enabled(query_params=None):
+    """
+    Checks the TMB_PROFILE environment variable, then the profile query parameter.
+    """
+    if os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes'):
+        return True
+    return query_params is not None and query_params.get('profile', '').lower() in ('1', 'true', 'yes')
+
+
+def start(enabled):
+    """
+    Starts profiling the rerun running in this thread, if enabled. Returns the profiler or None.
+    """
+    _current.profiler = Profiler() if enabled else None
+    return _current.profiler
+
+
+def stop():
+    """
+    Stops profiling the rerun running in this thread. Returns the profiler or None.
+    """
+    profiler = getattr(_current, 'profiler', None)
+    _current.profiler = None
+    if profiler is not None:
+        profiler.finish()
+    return profiler
+
+
+def current():
+    return getattr(_current, 'profiler', None)
+
+
+@contextmanager
+def section(name):
+    """
+    Times the code in the with block under name, when this rerun is profiled.
+    """
+    profiler = current()
+    if profiler is None:
+        yield
+    else:
+        with profiler.section(name):
+            yield
+
+
+def watch(name, cache):
+    """
+    Counts the hits and misses of a cache (anything with hits and misses counters) over this rerun.
+    """
+    profiler = current()
+    if profiler is not None:
+        profiler.watch(name, cache)
+
+
+@contextmanager
+def fragment(name, query_params=None):
+    """
+    Times a fragment. Within a full rerun it is a section; when the fragment reruns on its own,
+    it is profiled as a rerun of its own and logged, but not shown in the sidebar panel.
+    """
+    if current() is not None:
+        with section(name):
+            yield
+        return
+    profiler = start(is_enabled(query_params))
+    if profiler is not None:
+        profiler.page = f'fragment: {name}'
+    try:
+        yield
+    finally:
+        stop()
+    if profiler is not None:
+        profiler.write()
+
+
+def set_page(page):
+    profiler = current()
+    if profiler is not None:
+        profiler.page = page
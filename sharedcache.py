@@ -0,0 +1,250 @@
+"""
+A cache of built datasets and rendered images shared by every app process on a host.
+
+    python sharedcache.py status
+    python sharedcache.py clear
+
+Entries are stored by name and data version, one version per name, in a store on disk
+that all replicas read: a folder of files (the default) or a SQLite database. The store is
+chosen with the TMB_SHARED_CACHE environment variable:
+
+    TMB_SHARED_CACHE=dir:data/.cache/shared
+    TMB_SHARED_CACHE=sqlite:/var/cache/tmb/shared.db
+    TMB_SHARED_CACHE=none
+
+In front of the store, each process keeps the unpickled objects in an in-memory LRU and
+hands the same object to every caller, so sessions share them without a copy and must not
+modify them.
+"""
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import closing, suppress
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+SHARED_CACHE_ENV = 'TMB_SHARED_CACHE'
+SHARED_CACHE_DIR = 'data/.cache/shared'
+
+# Bumped when the layout of a cached dataset changes, so older pickles are never read back
+CACHE_FORMAT = 4
+
+
+class DirectoryBackend:
+    """
+    Stores each entry as a file named after its version, in a folder named after the entry.
+    """
+
+    def __init__(self, root=SHARED_CACHE_DIR):
+        self.root = root
+
+    def __repr__(self):
+        return f'dir:{self.root}'
+
+    def _folder(self, name):
+        return os.path.join(self.root, quote(name, safe=''))
+
+    def get(self, name, version):
+        try:
+            with open(os.path.join(self._folder(name), f'{version}.bin'), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, name, version, data):
+        folder = self._folder(name)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f'{version}.bin')
+        # Written aside and renamed, so a reader in another process never sees half a file
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        for file in os.listdir(folder):
+            if file != f'{version}.bin' and not file.endswith('.tmp'):
+                # Another process may be pruning the same folder
+                with suppress(FileNotFoundError):
+                    os.remove(os.path.join(folder, file))
+
+    def entries(self):
+        """
+        Returns (name, version, size) of every stored entry.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for folder in sorted(os.listdir(self.root)):
+            for file in os.listdir(os.path.join(self.root, folder)):
+                if file.endswith('.bin'):
+                    size = os.path.getsize(os.path.join(self.root, folder, file))
+                    entries.append((unquote(folder), file[:-len('.bin')], size))
+        return entries
+
+    def clear(self):
+        for name, _, _ in self.entries():
+            folder = self._folder(name)
+            for file in os.listdir(folder):
+                os.remove(os.path.join(folder, file))
+            os.rmdir(folder)
+
+
+class SQLiteBackend:
+    """
+    Stores the entries in one SQLite table, in WAL mode so readers never wait on a writer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (name TEXT PRIMARY KEY, version TEXT, data BLOB)')
+
+    def __repr__(self):
+        return f'sqlite:{self.path}'
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, name, version):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT data FROM entries WHERE name = ? AND version = ?', (name, version)).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def put(self, name, version, data):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (name, version, sqlite3.Binary(data)))
+
+    def entries(self):
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT name, version, length(data) FROM entries ORDER BY name').fetchall()
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM entries')
+
+
+def backend_from_env():
+    """
+    Returns the store named by TMB_SHARED_CACHE, the default folder if unset, or None for 'none'.
+    """
+    setting = os.environ.get(SHARED_CACHE_ENV, f'dir:{SHARED_CACHE_DIR}')
+    kind, _, location = setting.partition(':')
+    if kind == 'none':
+        return None
+    if kind == 'dir':
+        return DirectoryBackend(location or SHARED_CACHE_DIR)
+    if kind == 'sqlite':
+        return SQLiteBackend(location or os.path.join(SHARED_CACHE_DIR, 'shared.db'))
+    raise ValueError(f"{SHARED_CACHE_ENV} must be 'dir:<folder>', 'sqlite:<file>' or 'none', not {setting!r}")
+
+
+class SharedCache:
+    """
+    Built datasets keyed by name and data version: an in-memory LRU of the objects, in front of
+    the shared store holding them pickled. A dataset is only built when neither has it.
+    """
+
+    def __init__(self, backend=None, max_bytes=512 * 1024 * 1024):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._objects = OrderedDict() # (name, version) -> (object, pickled size)
+        self._lock = threading.Lock()
+        self._build_locks = defaultdict(threading.Lock) # so sessions asking at once build a dataset once
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get_or_build(self, name, version, build):
+        """
+        Returns the dataset stored under name for this data version, calling build() to make it on a miss.
+        """
+        # Pickles are only read back by the same cache format and pandas version
+        stored_version = f'{version}-{CACHE_FORMAT}-pandas{pd.__version__}'
+        key = (name, stored_version)
+        value = self._lookup(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            build_lock = self._build_locks[key]
+        with build_lock:
+            # Another session may have loaded it while this one waited
+            value = self._lookup(key)
+            if value is not None:
+                return value
+
+            data = self.backend.get(name, stored_version) if self.backend is not None else None
+            if data is not None:
+                value = pickle.loads(data)
+                with self._lock:
+                    self.shared_hits += 1
+            else:
+                value = build()
+                data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                if self.backend is not None:
+                    self.backend.put(name, stored_version, data)
+                with self._lock:
+                    self.misses += 1
+
+            self._remember(key, value, len(data))
+        with self._lock:
+            self._build_locks.pop(key, None)
+        return value
+
+    def _lookup(self, key):
+        with self._lock:
+            if key not in self._objects:
+                return None
+            self._objects.move_to_end(key)
+            self.hits += 1
+            return self._objects[key][0]
+
+    def _remember(self, key, value, size):
+        with self._lock:
+            # Older versions of the same dataset are never asked for again
+            for old_key in [k for k in self._objects if k[0] == key[0]]:
+                self.size -= self._objects.pop(old_key)[1]
+            self._objects[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes and len(self._objects) > 1:
+                _, (_, evicted_size) = self._objects.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._objects.clear()
+            self.size = 0
+
+
+def main(argv):
+    backend = backend_from_env()
+    command = argv[0] if argv else 'status'
+    if backend is None:
+        print(f'The shared cache is disabled by {SHARED_CACHE_ENV}=none')
+        return 0
+    if command == 'status':
+        entries = backend.entries()
+        print(f'{backend}: {len(entries)} entries, {sum(size for _, _, size in entries) / 1e6:.1f} MB')
+        for name, version, size in entries:
+            print(f'  {name}  {version}  {size / 1e3:.0f} kB')
+    elif command == 'clear':
+        backend.clear()
+        print(f'Cleared {backend}')
+    else:
+        print('usage: python sharedcache.py [status|clear]')
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
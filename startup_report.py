@@ -0,0 +1,74 @@
+"""
+Reports the cold-start cost of every page of the app.
+
+    python startup_report.py [--output startup.json]
+
+Each page is opened in a fresh interpreter: the app starts on Home, then the
+sidebar switches to the page. For each page the report gives the time of the
+first run, the time of the page's own first render, and which of the heavy
+data and plotting modules ended up imported.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+PAGES = ["Home", "Team Lineup", "Player Statistics", "Player Comparison", "Club Overview", "Media"]
+HEAVY_MODULES = ['pandas', 'pyarrow', 'scipy', 'matplotlib.pyplot', 'mplsoccer', 'seaborn', 'plotly.express']
+
+
+def measure_page(page):
+    """
+    Opens the app on Home, then switches to page. Runs inside the child interpreter.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    at = AppTest.from_file('tmb.py', default_timeout=300).run()
+    first_run = time.perf_counter() - start
+
+    page_run = first_run
+    if page != "Home":
+        start = time.perf_counter()
+        at.sidebar.radio[0].set_value(page).run()
+        page_run = time.perf_counter() - start
+
+    return {
+        'page': page,
+        'first_run_s': first_run,
+        'page_render_s': page_run,
+        'imported': [m for m in HEAVY_MODULES if m in sys.modules],
+        'errors': [e.value for e in at.exception],
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--page', help=argparse.SUPPRESS)  # used by the child interpreter
+    args = parser.parse_args(argv)
+
+    if args.page:
+        print(json.dumps(measure_page(args.page)))
+        return 0
+
+    report = []
+    for page in PAGES:
+        child = subprocess.run([sys.executable, __file__, '--page', page],
+                               capture_output=True, text=True, check=True)
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        report.append(result)
+        print(f"{page:<18} first run {result['first_run_s']:6.2f}s  page {result['page_render_s']:6.2f}s  "
+              f"imports: {', '.join(result['imported']) or '-'}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from events import EVENT_TYPES
+
+# Columns of player_info shown on the player summary
+PROFILE_FIELDS = ['primary_position', 'secondary_position', 'number', 'fav_club',
+                  'player_rating', 'description', 'comparison_to_real_players']
+
+
+def player_totals(events):
+    """
+    Returns the goals and assists of every player as a frame indexed by name.
+    Summed with bincount over the integer player codes, so no string is compared.
+    """
+    players = events['player_id'].cat.categories
+    player_codes = events['player_id'].cat.codes.to_numpy()
+    type_codes = events['event_type'].cat.codes.to_numpy()
+    counts = events['count'].to_numpy()
+
+    totals = dict()
+    for type_code, column in enumerate(EVENT_TYPES.values()):
+        of_type = type_codes == type_code
+        totals[column] = np.bincount(player_codes[of_type], weights=counts[of_type], minlength=len(players))
+    return pd.DataFrame(totals, index=players).astype(int)
+
+
+def per_match(events, match_dates):
+    """
+    Returns the goals and assists per match of the given events, with a 0 on dates without any.
+    """
+    series = pd.DataFrame(0, index=match_dates, columns=list(EVENT_TYPES.values()))
+    if len(events):
+        counts = events.pivot_table(index='match_date', columns='event_type', values='count',
+                                    aggfunc='sum', observed=False).rename(columns=EVENT_TYPES)
+        series = series.add(counts.reindex(match_dates), fill_value=0)
+    return series.fillna(0).rename_axis('Date').reset_index()
+
+
+def build_player_index(player_info):
+    """
+    Precomputes the player summary data once, keyed by player name.
+    Each record holds the profile fields; goals and assists come from LiveStats, which includes ingested matches.
+    """
+    player_index = dict()
+    for record in player_info.to_dict('records'):
+        player_index[record['player_name']] = {field: record[field] for field in PROFILE_FIELDS}
+    return player_index
+
+
+def rank_players(totals, column, n=5):
+    """
+    To help to rank the players by their total goals or assists. Top 5 by default.
+    The pages use Leaderboard.top; this full sort is kept as the baseline the benchmark compares it with.
+    """
+    # Sort the names first so that ties rank in the same order whatever the squad order
+    ranked = totals[column].sort_index().sort_values(ascending=False, kind='stable').head(n)
+    return pd.DataFrame({'Name': ranked.index, 'Value': ranked.to_numpy()})
+
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from dataloader import SHEETS
+
+POSITIONS = ['FWD', 'MID', 'DEF', 'GK']
+CLUBS = ['Tottenham', 'Liverpool', 'Arsenal', 'Chelsea', 'Manchester United', 'Barcelona']
+
+
+def make_sheets(n_players, n_matches, seed=0):
+    """
+    Builds workbook sheets for a synthetic squad with the same layout as tmb_fc_data.xlsx.
+    Goals and assists are sparse, with empty cells where a player did not contribute.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f'Player {i:04d}' for i in range(n_players)]
+
+    # About a fifth of the squad has no secondary position
+    secondary = [POSITIONS[i] if i < len(POSITIONS) else np.nan
+                 for i in rng.integers(0, len(POSITIONS) + 1, size=n_players)]
+    player_info = pd.DataFrame({
+        'player_name': names,
+        'primary_position': [POSITIONS[i % len(POSITIONS)] for i in range(n_players)],
+        'secondary_position': secondary,
+        'number': [i + 1 for i in range(n_players)],
+        'team_name': 'TMB FC',
+        'fav_club': rng.choice(CLUBS, size=n_players),
+        'player_rating': rng.integers(70, 95, size=n_players),
+        'description': [f'{name} is a synthetic player.' for name in names],
+        'comparison_to_real_players': 'Nobody in particular',
+    })
+
+    dates = pd.date_range('2023-12-16', periods=n_matches, freq='7D')
+
+    def contributions(rate):
+        values = rng.poisson(rate, size=(n_matches, n_players)).astype(float)
+        values[values == 0] = np.nan
+        return pd.concat([pd.DataFrame({'Date': dates}), pd.DataFrame(values, columns=names)], axis=1)
+
+    # Keep the team scoring a few goals per match, whatever the squad size
+    goals = contributions(3 / n_players)
+    assists = contributions(2 / n_players)
+
+    win, draw = int(n_matches * .6), int(n_matches * .1)
+    club_info = pd.DataFrame({'team': ['TMB FC'], 'games_played': [n_matches],
+                              'win': [win], 'draw': [draw], 'loss': [n_matches - win - draw]})
+
+    return {'player_info': player_info, 'goals': goals, 'assists': assists, 'club_info': club_info}
+
+
+def write_workbook(sheets, excel_file):
+    """
+    Writes synthetic sheets to an excel workbook.
+    """
+    with pd.ExcelWriter(excel_file) as writer:
+        for sheet in SHEETS:
+            sheets[sheet].to_excel(writer, sheet_name=sheet, index=False)
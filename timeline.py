@@ -0,0 +1,127 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Most points a line chart is sent; longer ranges are summed per week, month, quarter or year
+CHART_POINTS = 60
+CHART_FREQUENCIES = [('W-SAT', 'week'), ('MS', 'month'), ('QS', 'quarter'), ('YS', 'year')]
+
+
+class Timeline:
+    """
+    A per-match series (a Date column and one column per count) over a sorted date index.
+
+    Running totals are kept as prefix sums, so the totals of any date window cost two binary
+    searches and a subtraction, and slicing a window for a chart never scans the full history.
+    Matches are added in place: the arrays have room to grow at the end, so a new latest
+    match costs only its own rows.
+    """
+
+    def __init__(self, series):
+        self.columns = [column for column in series.columns if column != 'Date']
+        self._lock = threading.RLock() # sessions read while ingested matches are added
+        self._load(series)
+
+    def _load(self, series):
+        series = series.sort_values('Date')
+        self._size = len(series)
+        self._dates = series['Date'].to_numpy(dtype='datetime64[ns]')
+        self._values = series[self.columns].to_numpy(dtype=np.int64).reshape(self._size, len(self.columns))
+        self._prefix = np.vstack([np.zeros((1, len(self.columns)), dtype=np.int64), np.cumsum(self._values, axis=0)])
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self._dates[:self._size])
+
+    @property
+    def values(self):
+        return self._values[:self._size]
+
+    @property
+    def prefix(self):
+        return self._prefix[:self._size + 1]
+
+    def _grow(self, size):
+        """
+        Makes room for size matches, doubling the arrays so appends are amortised constant time.
+        """
+        if size <= len(self._dates):
+            return
+        capacity = max(size, 2 * len(self._dates))
+        dates = np.empty(capacity, dtype='datetime64[ns]')
+        values = np.zeros((capacity, len(self.columns)), dtype=np.int64)
+        prefix = np.zeros((capacity + 1, len(self.columns)), dtype=np.int64)
+        dates[:self._size], values[:self._size], prefix[:self._size + 1] = self.dates, self.values, self.prefix
+        self._dates, self._values, self._prefix = dates, values, prefix
+
+    def add(self, series):
+        """
+        Adds a per-match frame with the same columns. Counts on dates already in the timeline are
+        added to them, and new dates become new matches. Only the prefix sums from the earliest
+        added date on are updated, so adding the latest matches does not touch the history.
+        """
+        series = series.groupby('Date')[self.columns].sum()
+        if series.empty:
+            return
+        dates = series.index.to_numpy(dtype='datetime64[ns]')
+        with self._lock:
+            new_dates = dates[~np.isin(dates, self._dates[:self._size])]
+            if len(new_dates) and self._size and new_dates[0] <= self._dates[self._size - 1]:
+                # A backfilled match: rebuild the arrays with it in place, at the cost of the full history
+                merged = self.window()
+                merged = pd.concat([merged, pd.DataFrame({'Date': new_dates, **{c: 0 for c in self.columns}})])
+                self._load(merged)
+            elif len(new_dates):
+                self._grow(self._size + len(new_dates))
+                self._dates[self._size:self._size + len(new_dates)] = new_dates
+                self._values[self._size:self._size + len(new_dates)] = 0
+                self._size += len(new_dates)
+
+            rows = np.searchsorted(self._dates[:self._size], dates)
+            self._values[rows] += series.to_numpy(dtype=np.int64)
+            first = rows.min()
+            self._prefix[first + 1:self._size + 1] = self._prefix[first] + np.cumsum(self._values[first:self._size], axis=0)
+
+    def bounds(self, start=None, end=None):
+        """
+        Returns the positions of the first match on or after start and after the last one on or before end.
+        """
+        dates = self._dates[:self._size]
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), 'left'))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), 'right'))
+        return lo, max(lo, hi)
+
+    def totals(self, start=None, end=None):
+        """
+        Returns a dict of column to its total between two dates, both inclusive.
+        """
+        with self._lock:
+            lo, hi = self.bounds(start, end)
+            return {column: int(total) for column, total in zip(self.columns, self.prefix[hi] - self.prefix[lo])}
+
+    def window(self, start=None, end=None):
+        """
+        Returns the matches between two dates as a frame with a Date column.
+        """
+        with self._lock:
+            lo, hi = self.bounds(start, end)
+            frame = pd.DataFrame(self.values[lo:hi].copy(), columns=self.columns)
+            frame.insert(0, 'Date', self.dates[lo:hi])
+        return frame
+
+    def chart_data(self, start=None, end=None, max_points=CHART_POINTS):
+        """
+        Returns the window to plot and the period its points are summed over ('match' when not aggregated).
+        """
+        frame = self.window(start, end)
+        if len(frame) <= max_points:
+            return frame, 'match'
+        for frequency, period in CHART_FREQUENCIES:
+            aggregated = frame.resample(frequency, on='Date').sum().reset_index()
+            if len(aggregated) <= max_points:
+                break
+        return aggregated, period
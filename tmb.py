@@ -1,100 +1,131 @@
-import pandas as pd
-import plotly.express as px
 import streamlit as st
 from st_social_media_links import SocialMediaIcons
-import matplotlib.pyplot as plt
-from mplsoccer.pitch import Pitch
-import seaborn as sns
 import random
-from dummydata import generate_dummy_passes
+
+import profiling
 
 # Set page configuration
 st.set_page_config(page_title="TMB FC", layout="wide", initial_sidebar_state="collapsed")
 
+# The data and plotting modules are imported by the pages that use them,
+# so Home and Media paint without loading pandas, matplotlib or plotly.
+
+def current_version():
+    """
+    Returns the version of the workbook, used to key the cached data.
+    """
+    from dataloader import data_version
+    with profiling.section("data_version"):
+        return data_version()
+
+@st.cache_resource # one shared cache per process, in front of the store shared by every process on the host
+def get_shared_cache():
+    from sharedcache import SharedCache, backend_from_env
+    return SharedCache(backend_from_env())
+
 # Load data
-@st.cache_data(ttl=86400) # cached expires every 24hrs
-def load_data():
+def load_data(version):
+    """
+    Returns the player and club tables. They are keyed by the workbook version, so an updated spreadsheet
+    is picked up at once, and every session gets the same objects, which must not be modified.
+    """
+    from datasets import cached_tables
+
+    shared_cache = get_shared_cache()
+    profiling.watch("datasets", shared_cache)
+    with profiling.section("load_data"):
+        # 1. Load data from the columnar cache of the excel workbook
+        # 2. Build the supporting tables
+        return cached_tables(shared_cache, version)
 
-    # 1. Load data from excel
-    excel_file = 'data/tmb_fc_data.xlsx'
-    player_info = pd.read_excel(excel_file, sheet_name='player_info')
-    goals = pd.read_excel(excel_file, sheet_name='goals')
-    assists = pd.read_excel(excel_file, sheet_name='assists')
-    club_info = pd.read_excel(excel_file, sheet_name='club_info')
+# Load pass data
+def load_player_passes(version, player):
+    """
+    Returns a player's passes and heatmap grid: their partition of the pass store, or the generated passes
+    until real ones are ingested. Only the player pages need these, so they are built on first use.
+    """
+    from datasets import player_passes
 
-    # create supporting tables
-    df_pos_count = player_info.groupby(['primary_position'])['primary_position'].count() # Get the number of players in each position
-    passes_data = generate_dummy_passes()
+    shared_cache = get_shared_cache()
+    profiling.watch("datasets", shared_cache)
+    with profiling.section("load_player_passes"):
+        return player_passes(shared_cache, version, player)
 
-    return player_info, goals, assists, club_info, df_pos_count, passes_data
+@st.cache_resource # one cache of rendered heatmaps shared by every session, and through the store by every process
+def get_heatmap_cache():
+    from heatmap import HeatmapCache
+    from sharedcache import backend_from_env
+    return HeatmapCache(backend=backend_from_env())
 
-player_info, goals, assists, club_info, df_pos_count, passes_data = load_data()
+@st.cache_resource(max_entries=1) # running totals shared by every session, updated in place as matches are ingested
+def get_live_stats(version):
+    from ingest import LiveStats
+
+    _, events, match_dates, club_info, _, _ = load_data(version)
+    return LiveStats(events, match_dates, club_info)
+
+def current_live_stats():
+    """
+    Returns the running totals with any newly ingested matches applied.
+    """
+    live_stats = get_live_stats(current_version())
+    with profiling.section("live stats refresh"):
+        live_stats.refresh()
+    return live_stats
+
+def period_filter(live_stats, key):
+    """
+    Lets the user pick a season or a date range. Returns the (start, end) dates, None for an open end.
+    """
+    seasons = live_stats.leaderboard.seasons()
+    periods = ["All time"] + list(seasons)[::-1] + ["Custom range"]
+    period = st.selectbox("Period", periods, key=f"period_{key}",
+                          format_func=lambda p: f"Season {p}" if p in seasons else p)
+
+    if period == "All time":
+        return None, None
+    if period == "Custom range":
+        match_dates = live_stats.leaderboard.match_dates
+        first, last = match_dates[0].date(), match_dates[-1].date()
+        picked = st.date_input("Dates", (first, last), min_value=first, max_value=last, key=f"range_{key}")
+        # Only the start is set while the user is still picking the end
+        start = picked[0] if len(picked) > 0 else None
+        end = picked[1] if len(picked) > 1 else None
+        return start, end
+    return seasons[period]
 
 # Set up Streamlit UI
 def main():
     # Navigation bar
     st.sidebar.title("Navigation")
-    pages = ["Home", "Team Lineup", "Player Statistics", "Club Overview", "Media"]
+    pages = ["Home", "Team Lineup", "Player Statistics", "Player Comparison", "Club Overview", "Media"]
     page = st.sidebar.radio("Go to", pages)
+    profiling.set_page(page)
 
     if page == "Team Lineup":
-
         col1, col2 = st.columns([1, 5])
         with col1:
             st.title("TMB FC")
         with col2:
             st.image("images/tmb_logo.png", width=140)
 
-        with st.expander("Team Lineup", expanded=True, icon="⚽"):
-            # create a dictionary for buttons
-            button_players = dict()
-            # create a dict of quotes to use about the different positions in football
-            positions_quotes = {'FWD': ['They spend most of the game doing nothing 🙃', 
-                                        "They won't come back to defend 😿", "Glory hunters 😼"],
-                                'MID': ['Their job is to manufacture and execute goal scoring opportunities for themselves or their teammates 🤖',
-                                        "Sorry, but we don't play tiki taka 😹",
-                                        'Pressure is for tyres! 😎'],
-                                'DEF': ["They clean up everyone else’s mess and still get blamed 🤣",
-                                        "They're better than Harry Maguire 😗",
-                                        'Just park the bus 🚌'],
-                                'GK': ["He's a keeper 😉", "The hardest position in the team 💀",
-                                       "Why didn't you save that? 🙄"]}
-            # Dynamically generate buttons for each player on the team.
-            for pos in ['FWD','MID','DEF','GK']:
-                with st.container(border=True):
-                    st.subheader(pos)
-                    st.write(f'*{random.choice(positions_quotes[pos])}*') # pick a random quote
-                    if pos in df_pos_count.index:
-                        filtered_players = player_info[player_info['primary_position']==pos]
-                        filtered_players.reset_index(inplace=True, drop=True)
-                        ncol = len(filtered_players)
-                        cols = st.columns(ncol, vertical_alignment ="center")
-                        for idx, row in filtered_players.iterrows():
-                            with cols[idx]:
-                                button_players[row['player_name']] = st.button(row['player_name'], type="primary")
-        
-        with st.expander("Player Summary", expanded=True, icon="🙎‍♂️"):
-            if True in button_players.values():
-                # Find the key corresponding to the value
-                player = next((k for k, v in button_players.items() if v == True), None)
-
-                # Generate Statistics based of the player button selected
-                if button_players[player]:
-                    generate_player_stats(player, page)
-                    
-            else:
-                st.markdown("Select a player from the team lineup and view their summary.")
+        # Only the grid and the summary rerun when a player is clicked
+        lineup_fragment()
 
     if page == "Player Statistics":
         st.title("Player Statistics")
 
         # Select player
+        player_info, _, _, _, _, _ = load_data(current_version())
         player_names = player_info['player_name'].unique()
         selected_player = st.selectbox("Select a player", player_names)
 
         # Generate Statistics
         generate_player_stats(selected_player, page)
 
+    if page == "Player Comparison":
+        comparison_page()
+
     if page == "Club Overview":
         club_overview_page()
 
@@ -114,38 +145,98 @@ def main():
         home_page()
 
 
+def select_player(player):
+    st.session_state["lineup_player"] = player
+
+@st.fragment
+def lineup_fragment():
+    """
+    The Team Lineup grid. Clicking a player reruns this fragment, with the summary inside it, but not the page.
+    """
+    with profiling.fragment("lineup", st.query_params):
+        _, _, _, _, lineup, _ = load_data(current_version())
+
+        with profiling.section("lineup grid"), st.expander("Team Lineup", expanded=True, icon="⚽"):
+            # create a dict of quotes to use about the different positions in football
+            positions_quotes = {'FWD': ['They spend most of the game doing nothing 🙃', 
+                                        "They won't come back to defend 😿", "Glory hunters 😼"],
+                                'MID': ['Their job is to manufacture and execute goal scoring opportunities for themselves or their teammates 🤖',
+                                        "Sorry, but we don't play tiki taka 😹",
+                                        'Pressure is for tyres! 😎'],
+                                'DEF': ["They clean up everyone else’s mess and still get blamed 🤣",
+                                        "They're better than Harry Maguire 😗",
+                                        'Just park the bus 🚌'],
+                                'GK': ["He's a keeper 😉", "The hardest position in the team 💀",
+                                       "Why didn't you save that? 🙄"]}
+            # Dynamically generate buttons for each player on the team, from the grouping built at load
+            for pos in ['FWD','MID','DEF','GK']:
+                with st.container(border=True):
+                    st.subheader(pos)
+                    st.write(f'*{random.choice(positions_quotes[pos])}*') # pick a random quote
+                    if pos in lineup:
+                        cols = st.columns(len(lineup[pos]), vertical_alignment ="center")
+                        for col, player in zip(cols, lineup[pos]):
+                            # The selection is kept in the session, so it survives reruns of the summary
+                            col.button(player, type="primary", key=f"lineup_{player}", on_click=select_player, args=(player,))
+
+        player_summary_fragment()
+
+@st.fragment
+def player_summary_fragment():
+    """
+    The Player Summary of the selected player. Its own widgets (period, heatmap style) rerun only this fragment.
+    """
+    with profiling.fragment("player summary", st.query_params), st.expander("Player Summary", expanded=True, icon="🙎‍♂️"):
+        _, _, _, _, _, player_index = load_data(current_version())
+        player = st.session_state.get("lineup_player")
+
+        # Generate Statistics based of the player button selected
+        if player in player_index:
+            generate_player_stats(player, "Team Lineup")
+        else:
+            st.markdown("Select a player from the team lineup and view their summary.")
+
 def generate_player_stats(selected_player, page):
     """
     This function generates the statistics for an individual player
     """
-    # Filter data for the selected player
-    goals_player = goals[['Date', selected_player]].rename(columns={selected_player: 'Goals'})
-    assists_player = assists[['Date', selected_player]].rename(columns={selected_player: 'Assists'})
+    from charts import goals_assists_chart
+    from heatmap import HEATMAP_ENGINES
 
-    # Merge goals and assists data
-    player_data = pd.merge(goals_player, assists_player, on='Date', how='outer').fillna(0)
+    with profiling.section("player lookups"):
+        version = current_version()
+        _, _, _, _, _, player_index = load_data(version)
+        player_passes, heatmap_grid = load_player_passes(version, selected_player)
 
-    # Retrieve Metrics
-    total_goals = int(player_data['Goals'].sum())
-    total_assists = int(player_data['Assists'].sum())
+        # Look up the precomputed summary of the selected player, with ingested matches included
+        live_stats = current_live_stats()
+        player = player_index[selected_player]
+        player_timeline = live_stats.player_timeline(selected_player)
 
     # Retrieve Info
-    main_pos = player_info[player_info['player_name']==selected_player]['primary_position'].iloc[0]
-    sec_pos = player_info[player_info['player_name']==selected_player]['secondary_position'].iloc[0]
-    kit_num = player_info[player_info['player_name']==selected_player]['number'].iloc[0]
+    main_pos = player['primary_position']
+    sec_pos = player['secondary_position']
+    kit_num = player['number']
 
     # kit number can sometimes be a string value 'TBC'
     if isinstance(sec_pos, float):
         kit_num = str(int(kit_num))
 
-    fav_club = player_info[player_info['player_name']==selected_player]['fav_club'].iloc[0]
-    player_rating = player_info[player_info['player_name']==selected_player]['player_rating'].iloc[0]
-    player_desc = player_info[player_info['player_name']==selected_player]['description'].iloc[0]
-    comparison_to_real_players = player_info[player_info['player_name']==selected_player]['comparison_to_real_players'].iloc[0]
+    fav_club = player['fav_club']
+    player_rating = player['player_rating']
+    player_desc = player['description']
+    comparison_to_real_players = player['comparison_to_real_players']
 
     # Display player stats
     st.header(f"Summary of {selected_player}")
 
+    # Totals and chart of the chosen season or dates
+    start, end = period_filter(live_stats, page)
+    with profiling.section("period totals"):
+        totals = player_timeline.totals(start, end)
+        total_goals, total_assists = totals['Goals'], totals['Assists']
+        player_data, per = player_timeline.chart_data(start, end)
+
     col1, col2, _, _, _= st.columns(5)
 
     with col1:
@@ -169,190 +260,149 @@ def generate_player_stats(selected_player, page):
         st.write(f'*Comparable players: {comparison_to_real_players}*')
 
     # Time series chart
-    fig = px.line(
-        player_data,
-        x='Date',
-        y=['Goals', 'Assists'],
-        title=f"Goals and Assists Over Time for {selected_player}",
-        labels={"value": "Count", "Date": "Match Date"},
-    )
-    st.plotly_chart(fig)
+    with profiling.section("series chart"):
+        title = f"Goals and Assists Over Time for {selected_player}" + (f" (per {per})" if per != 'match' else "")
+        fig = goals_assists_chart(player_data, ['Goals', 'Assists'], title)
+    with profiling.section("st.plotly_chart"):
+        st.plotly_chart(fig)
 
     st.markdown('***')
 
     ### Heatmap of Passes ###
 
-    player_passes = passes_data[passes_data['player']==selected_player]
-    fig ,ax = plt.subplots(figsize=(13.5,8))
-    fig.set_facecolor('#1C1C1C')
-    ax.patch.set_facecolor('#1C1C1C')
-
-    #this is how we create the pitch
-    pitch = Pitch(pitch_type='statsbomb', 
-                pitch_color='#4ccf4c', 
-                line_color='#eeffee',
-                )
-
-    #Draw the pitch on the ax figure as well as invert the axis for this specific pitch
-    pitch.draw(ax=ax)
-    plt.gca().invert_yaxis()
-
-    #Create the heatmap
-    kde = sns.kdeplot(
-            x=player_passes['x'],
-            y=player_passes['y'],
-            fill = True,
-            shade_lowest=False,
-            alpha=.5,
-            n_levels=10,
-            cmap = 'magma', ax=ax
-    )
-
-    plt.xlim(0,120)
-    plt.ylim(0,80)
-    # plt.title(f"{selected_player}'s Heat Map From Recent Games",color='white',size=20)
+    show_passes = page == "Player Statistics"
 
     st.markdown(f"**{selected_player}'s Heat Map From Recent Games**")
     st.markdown(f"*Caution: This is a work-in-progress!* 🚧🛠️")
-    
-    if page == "Player Statistics":
+
+    if show_passes:
         st.write("*Green - Successful passes. Red - Unsuccessful passes.*")
-        # use a for loop to plot each pass
-        for x in range(len(player_passes['x'])):
-            if player_passes['outcome'][x] == 'Successful':
-                plt.plot((player_passes['x'][x],player_passes['endX'][x]),(player_passes['y'][x],player_passes['endY'][x]),color='green')
-                plt.scatter(player_passes['x'][x],player_passes['y'][x],color='green')
-            if player_passes['outcome'][x] == 'Unsuccessful':
-                plt.plot((player_passes['x'][x],player_passes['endX'][x]),(player_passes['y'][x],player_passes['endY'][x]),color='red')
-                plt.scatter(player_passes['x'][x],player_passes['y'][x],color='red')
-        
-    st.pyplot(fig)
-
-def melt_and_rank(data):
-    """
-    To help to transform the goals and assists data and rank the players.
-    """
-    # Melting the DataFrame
-    df = pd.melt(data, id_vars=["Date"], var_name="Name", value_name="Value")
-    # Group by 'Name' and sum the 'Value' column
-    df = df.groupby("Name", as_index=False)["Value"].sum()
-    # Sort by total goals in descending order. Top 5 only.
-    df = df.sort_values(by="Value", ascending=False).head(5)
-    return df
+
+    # The histogram is precomputed at load and much faster to draw; the kde is kept for comparison
+    engine = st.radio("Heatmap style", HEATMAP_ENGINES, horizontal=True, key=f"heatmap_engine_{page}",
+                      format_func=lambda e: {'histogram': 'Smoothed histogram', 'kde': 'Kernel density'}[e])
+
+    # Rendered images are shared across sessions and only redrawn when the player's passes change
+    heatmap_cache = get_heatmap_cache()
+    profiling.watch("heatmaps", heatmap_cache)
+    with profiling.section("heatmap"):
+        heatmap_image = heatmap_cache.get(selected_player, show_passes, player_passes, engine, heatmap_grid)
+    with profiling.section("st.image"):
+        st.image(heatmap_image, use_container_width=True)
 
 def club_overview_page():
+    from charts import goals_assists_chart, top_players_chart
+
+    player_info, _, _, club_info, _, _ = load_data(current_version())
+    live_stats = current_live_stats()
 
     club_name = club_info['team'].iloc[0]
     st.title(f"Club Overview: {club_name}")
 
-    games_played = club_info['games_played'].iloc[0]
-    win = club_info['win'].iloc[0]
-    draw = club_info['draw'].iloc[0]
-    loss = club_info['loss'].iloc[0]
+    # Goals, assists and top players of the chosen season or dates; the results are all time
+    start, end = period_filter(live_stats, "club")
 
-    col1, col2, col3, col4 = st.columns(4)
-    col1.metric("No. of games played", games_played, border=True)
-    col2.metric("Wins", win, border=True)
-    col3.metric("Draws", draw, border=True)
-    col4.metric("Losses", loss, border=True)
+    # Everything below is read from the club snapshot, built once per data version and period
+    with profiling.section("club snapshot"):
+        club = live_stats.club_snapshot(start, end)
 
-    # Get all the goals scored
-    df_players_only = goals.drop('Date', axis=1)
-    total_goals = int(df_players_only.sum().sum())
-
-    # Get all the assists made
-    df_players_only = assists.drop('Date', axis=1)
-    total_assists = int(df_players_only.sum().sum())
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("No. of games played", club['games_played'], border=True)
+    col2.metric("Wins", club['win'], border=True)
+    col3.metric("Draws", club['draw'], border=True)
+    col4.metric("Losses", club['loss'], border=True)
 
     # Get the count of players in the club
     num_players = int(len(player_info))
 
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Goals", total_goals, border=True)
-    col2.metric("Total Assists", total_assists, border=True)
+    col1.metric("Total Goals", club['total_goals'], border=True)
+    col2.metric("Total Assists", club['total_assists'], border=True)
     col3.metric("No. of Players", num_players, border=True)
 
-    # Filter data for the selected player
-    # Calculate the total goals for each row (ignoring NaN values)
-    all_goals, all_assists = goals.copy(), assists.copy()
-    all_goals['Total Goals'] = all_goals.iloc[:, 1:-1].sum(axis=1)
-    all_assists['Total Assists'] = all_assists.iloc[:, 1:-1].sum(axis=1)
-
-    # reduce data
-    all_goals = all_goals[['Date', 'Total Goals']]
-    all_assists = all_assists[['Date', 'Total Assists']]
-
-    # Merge goals and assists data
-    all_data = pd.merge(all_goals, all_assists, on='Date', how='outer').fillna(0)
-
-    with st.expander(label='View goals & assists across matches', expanded=True):
+    with profiling.section("team chart"), st.expander(label='View goals & assists across matches', expanded=True):
         # Time series chart
-        fig = px.line(
-            all_data,
-            x='Date',
-            y=['Total Goals', 'Total Assists'],
-            title=f"Goals and Assists Over Time",
-            labels={"value": "Count", "Date": "Match Date"},
-        )
+        title = "Goals and Assists Over Time" + (f" (per {club['per']})" if club['per'] != 'match' else "")
+        fig = goals_assists_chart(club['all_data'], ['Total Goals', 'Total Assists'], title)
         st.plotly_chart(fig)
     
-    with st.expander(label='View top player contributions', expanded=True):
-
-        top_scorers = melt_and_rank(goals)
-        top_assisters = melt_and_rank(assists)
+    with profiling.section("top player charts"), st.expander(label='View top player contributions', expanded=True):
 
         col1, col2 = st.columns(2)
 
         with col1:
-            # Plot horizontal bar chart using Plotly
-            fig = px.bar(
-                top_scorers,
-                x="Value",  # Total goals
-                y="Name",  # Player names
-                orientation="h",  # Horizontal orientation
-                title="Top 5 Players with Goals",
-                labels={"Value": "Total Goals", "Name": "Player"},
-                # color="Value",  # Color by total goals
-                # color_continuous_scale="YlOrBr"  # Yellow to brown color scale
-            )
-            # Update layout for better visualization
-            fig.update_layout(
-                xaxis_title="Total Goals",
-                yaxis_title="Player",
-                yaxis=dict(categoryorder="total ascending"),  # Sort y-axis by total goals
-                template="plotly_dark"  # Dark theme
-            )
-
-            fig.update_traces(marker_color='#00ff80')
+            fig = top_players_chart(club['top_scorers'], "Top 5 Players with Goals", "Total Goals")
+            # Display in Streamlit
+            st.plotly_chart(fig)
 
+        with col2:
+            fig = top_players_chart(club['top_assisters'], "Top 5 Players with Assists", "Total Assists")
             # Display in Streamlit
             st.plotly_chart(fig)
 
+        col1, col2 = st.columns(2)
+
+        with col1:
+            fig = top_players_chart(club['top_contributors'], "Top 5 Players with Goal Contributions", "Goals + Assists")
+            st.plotly_chart(fig)
+
         with col2:
-            # Plot horizontal bar chart using Plotly
-            fig = px.bar(
-                top_assisters,
-                x="Value",  # Total goals
-                y="Name",  # Player names
-                orientation="h",  # Horizontal orientation
-                title="Top 5 Players with Assists",
-                labels={"Value": "Total Assists", "Name": "Player"},
-                # color="Value",
-                # color_continuous_scale="YlOrBr"
-            )
-            # Update layout for better visualization
-            fig.update_layout(
-                xaxis_title="Total Assists",
-                yaxis_title="Player",
-                yaxis=dict(categoryorder="total ascending"),  # Sort y-axis by total goals
-                template="plotly_dark"  # Dark theme
-            )
-
-            fig.update_traces(marker_color='#00ff80')
+            fig = top_players_chart(club['in_form'], "In Form: Goal Contributions in the Last 5 Matches", "Goals + Assists")
+            st.plotly_chart(fig)
 
-            # Display in Streamlit
+def comparison_page():
+    from charts import comparison_chart, form_chart
+    from comparison import FORM_MATCHES, compare_players, form_chart_data
+    from datasets import players_heatmap_grids
+
+    st.title("Player Comparison")
+
+    version = current_version()
+    player_info, _, _, _, _, _ = load_data(version)
+    live_stats = current_live_stats()
+    player_names = list(player_info['player_name'].unique())
+
+    if st.checkbox("Whole squad", key="compare_all"):
+        players = player_names
+    else:
+        players = st.multiselect("Select players", player_names, default=player_names[:3], key="compare_players")
+    if not players:
+        st.markdown("Select some players to compare.")
+        return
+
+    start, end = period_filter(live_stats, "compare")
+
+    # Every metric of every selected player comes from one match by player matrix
+    with profiling.section("comparison"):
+        summary, form = compare_players(live_stats.leaderboard, players, start, end)
+
+    st.dataframe(summary, use_container_width=True,
+                 column_config={column: st.column_config.NumberColumn(format="%.2f")
+                                for column in summary.columns if column.endswith("per Match")})
+
+    with profiling.section("comparison charts"), st.expander(label='View goals, assists & form', expanded=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = comparison_chart(summary, ['Goals', 'Assists'], "Goals and Assists", "Total")
+            st.plotly_chart(fig)
+        with col2:
+            fig = comparison_chart(summary, ['Goals per Match', 'Assists per Match'], "Per Match", "Per Match")
             st.plotly_chart(fig)
 
+        fig = form_chart(form_chart_data(form), f"Form: Goal Contributions in the Last {FORM_MATCHES} Matches",
+                         "Goals + Assists")
+        st.plotly_chart(fig)
+
+    st.markdown("**Pass Heat Maps**")
+    st.markdown("Outlined: where each player's pass density is at least half of their peak.")
+    heatmap_cache = get_heatmap_cache()
+    profiling.watch("heatmaps", heatmap_cache)
+    with profiling.section("heatmap grids"):
+        grids = players_heatmap_grids(get_shared_cache(), version, players)
+    with profiling.section("heatmap overlay"):
+        heatmap_image = heatmap_cache.get_overlay(grids)
+    st.image(heatmap_image, use_container_width=True)
+
 def social_media():
     social_media_links = [
     "https://www.youtube.com/@TMBFootballTV",
@@ -391,6 +441,7 @@ def home_page():
 
         *   **Team Lineup:** View the current team roster, player positions, and fun facts about each player. Click on a player's button to view their individual statistics and a heatmap of their passes.
         *   **Player Statistics:** Explore detailed statistics for each player, including goals, assists, and performance over time. Select a player from the dropdown menu to view their information.
+        *   **Player Comparison:** Compare any players, or the whole squad, side by side: goals, assists, per-match rates, recent form and where on the pitch they pass from.
         *   **Club Overview:** Get an overview of the club's performance, including games played, wins, losses, draws, total goals, assists, and the number of players. You can also see a graph of the club's goals and assists over time.
         *   **Media:** Check out our latest videos and connect with us on our social media platforms.
 
@@ -400,5 +451,30 @@ def home_page():
     social_media()
 
 
+def profile_panel(profiler):
+    """
+    Shows the timings and cache counts of this run in the sidebar.
+    """
+    with st.sidebar.expander("Profile of this run", expanded=True, icon="⏱️"):
+        st.markdown(f"**{profiler.page}: {profiler.total * 1000:.0f} ms**")
+        rows = [f"| {'&nbsp;' * 4 * depth}{name} | {seconds * 1000:.1f} |" for name, depth, seconds in profiler.sections]
+        st.markdown("\n".join(["| Section | ms |", "|:--|--:|"] + rows), unsafe_allow_html=True)
+        for name, counts in profiler.cache_counts().items():
+            st.caption(f"{name}: " + ", ".join(f"{count} {counter.replace('_', ' ')}" for counter, count in counts.items()))
+
+def run():
+    """
+    Runs the app, timing the run when profiling is on (TMB_PROFILE=1 or ?profile=1).
+    """
+    profiling.start(profiling.is_enabled(st.query_params))
+    try:
+        main()
+    finally:
+        profiler = profiling.stop()
+    if profiler is not None:
+        profiler.write()
+        profile_panel(profiler)
+
+
 if __name__ == "__main__":
-    main()
+    run()